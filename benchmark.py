@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the fetch, parse, normalize, serialize, upload and pipeline stages
+
+Everything runs against the recorded fixtures (full_page.html,
+page_snippet.html, table_fragment.html) - no request leaves the machine.
+Results are written as JSON so runs can be compared over time.
+
+    python benchmark.py --iterations 50 --multiplier 100 --output bench.json
+"""
+
+import os
+import gc
+import sys
+import json
+import time
+import argparse
+import tempfile
+import platform
+import resource
+import statistics
+import subprocess
+import tracemalloc
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, patch
+
+# Storage settings are only read, never used: uploads go to a stub or a temp directory
+os.environ.setdefault('DATALAKE_ACCOUNT_NAME', 'benchmark')
+os.environ.setdefault('DATALAKE_ACCOUNT_KEY', 'YmVuY2htYXJr')
+
+import function_app
+import lake_sinks
+import wcl_http
+import wcl_ratelimit
+import wcl_parsers
+import wcl_normalize
+from local_datalake import LocalDataLakeServiceClient
+from replay_server import start_replay_server
+
+FIXTURE_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = ['table_fragment.html', 'full_page.html', 'page_snippet.html']
+
+def load_fixtures():
+    """Read the recorded pages, plus the full page with the table inlined (worst case)"""
+    fixtures = {}
+    for name in FIXTURES:
+        with open(os.path.join(FIXTURE_DIR, name), 'rb') as f:
+            fixtures[name] = f.read()
+
+    fixtures['full_page+table'] = fixtures['full_page.html'].replace(
+        b'<div id="table-container">',
+        b'<div id="table-container">' + fixtures['table_fragment.html']
+    )
+    return fixtures
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 2)
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def measure(name, func, iterations, rows_per_call=None):
+    """Time func() repeatedly, then run it once under tracemalloc for allocations"""
+    func()  # warm-up (imports, caches, connection setup)
+
+    gc.collect()
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    rows = rows_per_call if rows_per_call is not None else (len(result) if hasattr(result, '__len__') else 0)
+
+    # Tracing slows everything down, so allocations come from a separate run
+    tracemalloc.start()
+    func()
+    _, traced_peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocations = sum(stat.count for stat in snapshot.statistics('filename'))
+
+    total_seconds = sum(timings) / 1000
+    return {
+        'stage': name,
+        'iterations': iterations,
+        'rows_per_call': rows,
+        'rows_per_sec': round(rows * iterations / total_seconds, 1) if total_seconds and rows else None,
+        'p50_ms': round(statistics.median(timings), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'alloc_peak_kb': round(traced_peak / 1024, 1),
+        'alloc_blocks_retained': allocations,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+def bench_fetch(fixtures, iterations):
+    """Fetch the fragment and page from the local replay server through the shared session"""
+    server = start_replay_server()
+    urls = {
+        'table_fragment': f"{server.base_url}/zone/statistics/table/42/dps/0/5/20/3/1000/1/14/0/Any/Any/All/0/normalized/single/0/-1/",
+        'full_page': f"{server.base_url}/zone/statistics/42?class=Any"
+    }
+    results = []
+
+    # Measure the fetch itself, not the client-side token bucket
+    wcl_ratelimit.reset_rate_limiter(wcl_ratelimit.RateLimiter(rate=0, burst=1))
+    try:
+        for name, url in urls.items():
+            results.append(measure(
+                f"fetch:{name}",
+                lambda: wcl_http.get(url).content,
+                iterations,
+                rows_per_call=0
+            ))
+    finally:
+        server.shutdown()
+        wcl_ratelimit.reset_rate_limiter()
+
+    return results
+
+def bench_parse(fixtures, iterations):
+    """Run every parser backend over every fixture"""
+    results = []
+    for fixture, content in fixtures.items():
+        for backend, parse in wcl_parsers.PARSER_BACKENDS.items():
+            try:
+                parse(content, None)
+            except ImportError:
+                continue
+            results.append(measure(f"parse:{backend}:{fixture}", lambda: parse(content, 'bench'), iterations))
+    return results
+
+def bench_normalize(fixtures, iterations, multiplier):
+    """Row-at-a-time vs Arrow cleaning of one table and of a matrix run's worth of tables"""
+    raw = wcl_parsers.parse_with_soup(fixtures['table_fragment.html'], 'bench')
+    results = []
+    for label, batches in (('table', [raw]), (f'matrix_x{multiplier}', [raw] * multiplier)):
+        rows = sum(len(batch) for batch in batches)
+        for path, vectorize in (('python', False), ('arrow', True)):
+            results.append(measure(
+                f"normalize:{path}:{label}",
+                lambda: wcl_normalize.normalize_batches(batches, vectorize),
+                iterations,
+                rows
+            ))
+    return results
+
+def build_records(fixtures, multiplier):
+    """Parsed fixture rows repeated across fake shards to mimic a matrix run"""
+    rows = wcl_parsers.parse_summary_table(fixtures['table_fragment.html'], datetime.now(timezone.utc).isoformat(), backend='soup')
+    return [
+        {**row, 'zone': 42, 'boss': 3009 + shard % 8, 'difficulty': 5, 'metric': 'dps', 'partition': shard}
+        for shard in range(multiplier)
+        for row in rows
+    ]
+
+def bench_serialize(records, iterations):
+    """Compare the current indented JSON with the NDJSON and Parquet sinks"""
+    count = len(records)
+    return [
+        measure('serialize:json_indent', lambda: json.dumps(records, indent=2), iterations, count),
+        measure('serialize:ndjson_gzip', lambda: b''.join(lake_sinks.iter_ndjson_chunks(records, 'gzip')), iterations, count),
+        measure('serialize:parquet', lambda: lake_sinks.build_parquet_partitions(records, 'bench'), iterations, count)
+    ]
+
+def serialized_sizes(records):
+    """Bytes each sink would put on the wire for the same records"""
+    return {
+        'json_indent': len(json.dumps(records, indent=2).encode('utf-8')),
+        'ndjson_gzip': sum(len(chunk) for chunk in lake_sinks.iter_ndjson_chunks(records, 'gzip')),
+        'parquet': sum(len(payload) for payload in lake_sinks.build_parquet_partitions(records, 'bench').values())
+    }
+
+def bench_upload(records, iterations, latency_ms=20.0, concurrency=8):
+    """Exercise the upload paths against a stub and against the local filesystem lake"""
+    file_system_client = Mock()
+    file_client = Mock()
+    file_system_client.get_file_client.return_value = file_client
+
+    results = []
+    with patch.object(function_app, 'get_file_system_client', return_value=file_system_client):
+        results += [
+            measure('upload:json_stub', lambda: function_app.upload_to_data_lake(records), iterations, len(records)),
+            measure('upload:ndjson_stub', lambda: function_app.stream_ndjson_to_data_lake(records), iterations, len(records))
+        ]
+
+    # Real bytes on disk with a simulated round-trip per storage call
+    with tempfile.TemporaryDirectory(prefix='wcl-lake-') as root:
+        service = LocalDataLakeServiceClient(root, latency_ms=latency_ms)
+        file_system_client = service.get_file_system_client('warcraft-logs-data')
+        file_system_client.create_file_system()
+        # One small gzip NDJSON object per shard, the way a matrix run fans out
+        shard_payloads = {}
+        for record in records:
+            shard_payloads.setdefault(f"bench/shard={record['partition']}.ndjson.gz", []).append(record)
+        shard_payloads = {path: b''.join(lake_sinks.iter_ndjson_chunks(rows, 'gzip')) for path, rows in shard_payloads.items()}
+
+        def upload_shards(workers):
+            def upload(item):
+                file_system_client.get_file_client(item[0]).upload_data(item[1], overwrite=True)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(upload, shard_payloads.items()))
+
+        cases = [
+            ('upload:json_local', lambda: function_app.upload_to_data_lake(records), len(records)),
+            ('upload:ndjson_local', lambda: function_app.stream_ndjson_to_data_lake(records), len(records)),
+            ('upload:shards_local_serial', lambda: upload_shards(1), len(records)),
+            (f'upload:shards_local_x{concurrency}', lambda: upload_shards(concurrency), len(records))
+        ]
+        with patch.object(function_app, 'get_file_system_client', return_value=file_system_client):
+            for name, func, rows in cases:
+                service.stats.reset()
+                result = measure(name, func, iterations, rows)
+                # Totals over the warm-up, timed and tracemalloc runs
+                result['lake'] = service.stats.snapshot()
+                results.append(result)
+
+    return results
+
+def bench_pipeline(iterations, shards=32, latency_ms=20.0, concurrency=8):
+    """Matrix scrape then per-shard upload, back to back vs overlapped through wcl_pipeline"""
+    server = start_replay_server(latency_ms=latency_ms)
+    matrix = function_app.build_scrape_matrix(bosses=list(range(1, shards + 1)), partitions=[1])
+    results = []
+
+    def sequential():
+        data, _ = function_app.scrape_wcl_matrix(matrix, max_concurrency=concurrency)
+        for batch in data.batches:
+            function_app.upload_shard(batch.tags, batch, 'ndjson', 'bench')
+
+    # The client-side rate limit would dominate; only stage overlap is measured here
+    wcl_ratelimit.reset_rate_limiter(wcl_ratelimit.RateLimiter(rate=0, burst=1, initial_concurrency=concurrency))
+    try:
+        with tempfile.TemporaryDirectory(prefix='wcl-lake-') as root, \
+                patch.object(wcl_http, 'WCL_BASE_URL', server.base_url), \
+                patch.object(function_app, 'WCL_BASE_URL', server.base_url):
+            service = LocalDataLakeServiceClient(root, latency_ms=latency_ms)
+            file_system_client = service.get_file_system_client('warcraft-logs-data')
+            file_system_client.create_file_system()
+            with patch.object(function_app, 'get_file_system_client', return_value=file_system_client):
+                # Few iterations: every one is a full matrix run against the replay server
+                runs = max(1, iterations // 5)
+                results.append(measure(f'pipeline:sequential_x{shards}', sequential, runs, shards))
+                results.append(measure(
+                    f'pipeline:overlapped_x{shards}',
+                    lambda: function_app.run_matrix_pipeline(matrix, 'ndjson', concurrency),
+                    runs,
+                    shards
+                ))
+    finally:
+        server.shutdown()
+        wcl_ratelimit.reset_rate_limiter()
+
+    return results
+
+def git_revision():
+    """Current commit, so results can be lined up with code changes"""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=FIXTURE_DIR, text=True).strip()
+    except Exception:
+        return None
+
+def run_benchmarks(iterations=20, multiplier=50, stages=None, lake_latency_ms=20.0):
+    """Run the selected stages and return the machine-readable report"""
+    stages = stages or ['fetch', 'parse', 'normalize', 'serialize', 'upload', 'pipeline']
+    fixtures = load_fixtures()
+    records = build_records(fixtures, multiplier)
+
+    results = []
+    if 'fetch' in stages:
+        results += bench_fetch(fixtures, iterations)
+    if 'parse' in stages:
+        results += bench_parse(fixtures, iterations)
+    if 'normalize' in stages:
+        results += bench_normalize(fixtures, iterations, multiplier)
+    if 'serialize' in stages:
+        results += bench_serialize(records, iterations)
+    if 'upload' in stages:
+        results += bench_upload(records, iterations, lake_latency_ms)
+    if 'pipeline' in stages:
+        results += bench_pipeline(iterations, latency_ms=lake_latency_ms)
+
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'iterations': iterations,
+        'records': len(records),
+        'serialized_bytes': serialized_sizes(records) if 'serialize' in stages else None,
+        'peak_rss_mb': peak_rss_mb(),
+        'results': results
+    }
+
+def print_report(report):
+    """Human-readable summary of a report"""
+    print(f"{'stage':<48} {'p50 ms':>10} {'p99 ms':>10} {'rows/s':>12} {'alloc KB':>10}")
+    for result in report['results']:
+        rows_per_sec = f"{result['rows_per_sec']:.0f}" if result['rows_per_sec'] else '-'
+        print(f"{result['stage']:<48} {result['p50_ms']:>10.3f} {result['p99_ms']:>10.3f} {rows_per_sec:>12} {result['alloc_peak_kb']:>10.1f}")
+    if report['serialized_bytes']:
+        print(f"\nSerialized bytes for {report['records']} records: {report['serialized_bytes']}")
+    print(f"Peak RSS: {report['peak_rss_mb']} MB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--multiplier', type=int, default=50, help='fake shards to replicate fixture rows across')
+    parser.add_argument('--stages', nargs='+', choices=['fetch', 'parse', 'normalize', 'serialize', 'upload', 'pipeline'])
+    parser.add_argument('--lake-latency-ms', type=float, default=20.0, help='simulated round-trip per local lake call')
+    parser.add_argument('--output', default=f"benchmark_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}.json")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.iterations, args.multiplier, args.stages, args.lake_latency_ms)
+    print_report(report)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {args.output}")
@@ -12,7 +12,7 @@ from unittest.mock import Mock, patch
 # Import the function logic
 import sys
 sys.path.append('/mnt/d/Projects/wcl-data-aggregator/wcl-data-importer')
-from function_app import scrape_wcl_damage_data, upload_to_data_lake, get_data_lake_client
+from function_app import scrape_wcl_damage_data, upload_to_data_lake, get_data_lake_client, reset_data_lake_clients
 
 def test_environment_setup():
     """Test that environment variables are set correctly"""
@@ -73,8 +73,11 @@ def test_data_lake_upload_mock(data):
         return False
     
     try:
+        # Clients are cached per process, so drop any real client built earlier
+        reset_data_lake_clients()
+        
         # Mock the Azure Data Lake client
-        with patch('function_app.DataLakeServiceClient') as mock_service_client:
+        with patch('azure.storage.filedatalake.DataLakeServiceClient') as mock_service_client:
             # Mock the file system client
             mock_file_system = Mock()
             mock_file_client = Mock()
@@ -87,7 +90,7 @@ def test_data_lake_upload_mock(data):
             
             print(f"✓ Upload function executed successfully")
             print(f"✓ Would upload to path: {file_path}")
-            print(f"✓ Data size: {len(json.dumps(data))} bytes")
+            print(f"✓ Data size: {len(json.dumps(list(data)))} bytes")
             print(f"✓ Record count: {len(data)}")
             
             # Verify the mock was called correctly
@@ -96,14 +99,257 @@ def test_data_lake_upload_mock(data):
             mock_file_client.upload_data.assert_called_once()
             
             print("✓ All Azure Data Lake SDK calls were made correctly")
+            
+            # A second upload on the same worker should reuse the cached clients
+            upload_to_data_lake(data)
+            mock_service_client.assert_called_once()
+            mock_file_system.create_file_system.assert_called_once()
+            print("✓ Cached clients reused without re-creating the container")
             print()
             
+            reset_data_lake_clients()
             return True
             
     except Exception as e:
         print(f"✗ Upload failed: {e}")
         return False
 
+def test_data_lake_upload_local(data):
+    """Test the upload paths against the filesystem-backed lake and check what landed"""
+    print("=== Testing Data Lake Upload (Local Filesystem) ===")
+    
+    if not data:
+        print("✗ No data to upload")
+        return False
+    
+    from function_app import stream_ndjson_to_data_lake
+    import gzip
+    
+    try:
+        with tempfile.TemporaryDirectory() as lake_root:
+            reset_data_lake_clients()
+            with patch.dict(os.environ, {'DATALAKE_LOCAL_ROOT': lake_root, 'DATALAKE_LOCAL_LATENCY_MS': '5'}):
+                service = get_data_lake_client()
+                
+                json_path = upload_to_data_lake(data)
+                ndjson_path = stream_ndjson_to_data_lake(data)
+                
+                container = os.path.join(lake_root, 'warcraft-logs-data')
+                with open(os.path.join(container, json_path)) as f:
+                    assert json.load(f) == data
+                with gzip.open(os.path.join(container, ndjson_path), 'rt') as f:
+                    assert [json.loads(line) for line in f] == data
+                print(f"✓ Uploaded {json_path} and {ndjson_path}, contents round-trip")
+                
+                stats = service.stats.snapshot()
+                assert stats['calls'] == {'create_file_system': 1, 'upload_data': 1, 'create_file': 1, 'append_data': 1, 'flush_data': 1}
+                print(f"✓ Storage calls: {stats['calls']}")
+                print(f"✓ Bytes uploaded: {stats['bytes_uploaded']} in {stats['elapsed_seconds']}s")
+                print()
+            
+            reset_data_lake_clients()
+            return True
+    
+    except Exception as e:
+        reset_data_lake_clients()
+        print(f"✗ Local upload failed: {e}")
+        return False
+
+def test_truncated_responses_release_slots():
+    """Truncated bodies must give their concurrency slot back instead of wedging later fetches"""
+    print("=== Testing Truncated Responses (Replay Server) ===")
+    
+    import threading
+    import requests
+    import wcl_http
+    import wcl_ratelimit
+    from replay_server import start_replay_server
+    
+    server = start_replay_server(truncate_rate=1.0)
+    limiter = wcl_ratelimit.RateLimiter(rate=0, burst=1, initial_concurrency=2, max_concurrency=2)
+    wcl_ratelimit.reset_rate_limiter(limiter)
+    errors = []
+    
+    def fetch_all():
+        # More failing fetches than slots: a leaked slot would block the third one forever
+        for _ in range(4):
+            try:
+                wcl_http.get(f"{server.base_url}/zone/statistics/table/dps/42/0/5/20/1/Any/Any/0/0/0", max_retries=1)
+            except requests.RequestException as e:
+                errors.append(e)
+    
+    try:
+        worker = threading.Thread(target=fetch_all, daemon=True)
+        worker.start()
+        worker.join(timeout=30)
+        
+        if worker.is_alive():
+            print(f"✗ Fetch blocked with {limiter.concurrency.in_flight} slots held")
+            return False
+        assert len(errors) == 4, errors
+        assert limiter.concurrency.in_flight == 0, limiter.snapshot()
+        print(f"✓ {len(errors)} truncated fetches failed cleanly ({type(errors[0]).__name__}), in_flight = 0")
+        print(f"✓ Server stats: {server.stats}")
+        
+        # A streamed body is read after get() returns; its slot is held until the response is closed
+        server.faults['truncate_rate'] = 0.0
+        response = wcl_http.get(f"{server.base_url}/zone/statistics/table/dps/42/0/5/20/1/Any/Any/0/0/0", stream=True)
+        assert limiter.concurrency.in_flight == 1, limiter.snapshot()
+        response.close()
+        assert limiter.concurrency.in_flight == 0, limiter.snapshot()
+        print("✓ Streamed responses hold their slot until closed")
+        print()
+        return True
+    
+    except Exception as e:
+        print(f"✗ Truncated response check failed: {e!r}")
+        return False
+    
+    finally:
+        server.shutdown()
+        wcl_ratelimit.reset_rate_limiter()
+
+def test_delta_page_filter_sets():
+    """Delta runs of two page tables must each diff against their own previous rows and checkpoints"""
+    print("=== Testing Delta Ingestion Across Page Filter Sets ===")
+    
+    import function_app
+    from concurrent.futures import ThreadPoolExecutor
+    from replay_server import start_replay_server
+    
+    server = start_replay_server()
+    try:
+        with tempfile.TemporaryDirectory() as lake_root:
+            reset_data_lake_clients()
+            with patch.dict(os.environ, {'DATALAKE_LOCAL_ROOT': lake_root, 'WCL_DELTA_CHECKPOINT_EVERY': '3'}), \
+                    patch.object(function_app, 'WCL_BASE_URL', server.base_url):
+                def scrape(metric):
+                    rows = function_app.scrape_wcl_damage_data(metric=metric).to_dicts()
+                    # The replay server serves one fixture; make the other tables differ from the dps one
+                    return rows if metric == 'dps' else rows[:-1]
+                
+                summaries = []
+                for metric in ('dps', 'hps', 'dps', 'hps', 'hps', 'dps', 'hps', 'dps'):
+                    _, summary = function_app.upload_delta_to_data_lake(scrape(metric))
+                    summaries.append(summary)
+                    print(f"  {metric}: {summary}")
+                
+                # Two new tables imported at once must both land in the manifest
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    concurrent = list(executor.map(
+                        lambda metric: function_app.upload_delta_to_data_lake(scrape(metric))[1],
+                        ('tank', 'healer')
+                    ))
+                print(f"  tank/healer at once: {concurrent}")
+                
+                manifest_client = function_app.get_file_system_client().get_file_client(function_app.DELTA_MANIFEST_PATH)
+                manifest = json.loads(manifest_client.download_file().readall())
+        
+        unchanged = {'mode': 'delta', 'insert': 0, 'update': 0, 'remove': 0}
+        # Each table's first run is its checkpoint
+        assert [summary['mode'] for summary in summaries[:2]] == ['checkpoint', 'checkpoint'], summaries
+        # Unchanged tables: nothing may leak over from the other filter set
+        assert summaries[2:6] == [unchanged] * 4, summaries
+        # Every third run after its checkpoint, however often the other table ran
+        assert [summary['mode'] for summary in summaries[6:]] == ['checkpoint', 'checkpoint'], summaries
+        assert [summary['mode'] for summary in concurrent] == ['checkpoint', 'checkpoint'], concurrent
+        
+        scopes = {scope.split('|')[3] for scope in manifest['scopes']}
+        tables = {key.split('|')[3] for key in manifest['fingerprints']}
+        assert scopes == tables == {'dps', 'hps', 'tank', 'healer'}, (scopes, tables)
+        print("✓ Each filter set diffs and checkpoints on its own; concurrent imports keep both tables")
+        print()
+        return True
+    
+    except Exception as e:
+        print(f"✗ Delta filter set check failed: {e!r}")
+        return False
+    
+    finally:
+        server.shutdown()
+        reset_data_lake_clients()
+
+def test_embedded_state_extraction():
+    """Embedded state must only win when it holds the summary table; text renderings come last"""
+    print("=== Testing Embedded State Extraction ===")
+    
+    import wcl_parsers
+    
+    try:
+        with open('table_fragment.html', 'rb') as f:
+            fragment = f.read()
+        with open('embedded_state.html', 'rb') as f:
+            page = f.read()
+        
+        rows, strategy, _ = wcl_parsers.extract_rows(page)
+        assert (len(rows), strategy) == (39, 'embedded'), (len(rows), strategy)
+        print(f"  embedded_state.html: {len(rows)} rows via {strategy}")
+        
+        # Unrelated script state with class/spec keys in front of the table
+        for decoy in (b'{"class":"Mage","spec":"Fire","value":1,"count":3}',
+                      b'{"class":"Mage","spec":"Fire","score":1,"parses":3}'):
+            content = b'<script>window.specs=[' + decoy + b'];</script>\n' + fragment
+            rows, strategy, _ = wcl_parsers.extract_rows(content)
+            assert (len(rows), strategy) == (39, 'dom'), (len(rows), strategy)
+            print(f"  decoy {decoy.decode()}: {len(rows)} rows via {strategy}")
+        
+        # A text rendering of the table has neither state nor markup
+        import parse_text_data
+        rows, strategy, _ = wcl_parsers.extract_rows(parse_text_data.webpage_content.encode('utf-8'))
+        assert (len(rows), strategy) == (39, 'text'), (len(rows), strategy)
+        print(f"  text dump: {len(rows)} rows via {strategy}")
+        
+        print("✓ Only the real statistics state is decoded as the table")
+        print()
+        return True
+    
+    except Exception as e:
+        print(f"✗ Embedded state check failed: {e!r}")
+        return False
+
+def test_malformed_cells_rejected():
+    """Cells outside the accepted formats must be rejected, never reshaped into numbers"""
+    print("=== Testing Malformed Cell Rejection ===")
+    
+    import wcl_normalize
+    
+    # (score text, parses text, expected score, expected parses, expected reason)
+    cases = [
+        ('83.73', '28,751', 83.73, 28751, None),
+        (' 83.73% ', ' 1,234 ', 83.73, 1234, None),
+        ('1e3', '10', None, 10, 'invalid_score'),
+        ('55', '12 (3)', 55.0, None, 'invalid_parses'),
+        ('1.2.3', '10', None, 10, 'invalid_score'),
+        ('55', '1,2345', 55.0, None, 'invalid_parses'),
+        ('55', '1.0', 55.0, None, 'invalid_parses'),
+        ('-5', '10', -5.0, 10, 'score_out_of_range')
+    ]
+    classes = ['Mage'] * len(cases)
+    specs = ['Fire'] * len(cases)
+    scores = [case[0] for case in cases]
+    parses = [case[1] for case in cases]
+    
+    try:
+        for name, clean in (('python', wcl_normalize.clean_columns_python), ('arrow', wcl_normalize.clean_columns_arrow)):
+            score_values, parses_values, reasons, _ = clean(classes, specs, scores, parses)
+            for index, (score_text, parses_text, score, count, reason) in enumerate(cases):
+                found = reasons[index] or None
+                assert found == reason, (name, score_text, parses_text, found)
+                # The Arrow path fills rejected values with 0
+                if score is not None:
+                    assert score_values[index] == score, (name, score_text, score_values[index])
+                if count is not None:
+                    assert parses_values[index] == count, (name, parses_text, parses_values[index])
+            print(f"  {name}: {sum(reason is not None for *_, reason in cases)}/{len(cases)} cells rejected as expected")
+        
+        print("✓ Malformed cells are rejected with a reason on both paths")
+        print()
+        return True
+    
+    except Exception as e:
+        print(f"✗ Malformed cell check failed: {e!r}")
+        return False
+
 def test_data_lake_client():
     """Test the data lake client initialization"""
     print("=== Testing Data Lake Client ===")
@@ -185,9 +431,24 @@ def run_all_tests():
     # Test 4: Upload function (mocked)
     test_data_lake_upload_mock(data)
     
-    # Test 5: Complete workflow
+    # Test 5: Upload function (local filesystem lake)
+    test_data_lake_upload_local(data)
+    
+    # Test 6: Complete workflow
     test_complete_workflow()
     
+    # Test 7: Concurrency slots survive truncated responses
+    test_truncated_responses_release_slots()
+    
+    # Test 8: Delta ingestion keeps page tables apart
+    test_delta_page_filter_sets()
+    
+    # Test 9: Embedded state extraction ignores unrelated script state
+    test_embedded_state_extraction()
+    
+    # Test 10: Malformed score/parses cells are rejected
+    test_malformed_cells_rejected()
+    
     print("=" * 60)
     print("✓ ALL TESTS COMPLETED")
     print()
@@ -54,9 +54,10 @@ def create_sample_data():
         {"class": "Priest", "spec": "Holy", "score": 3.08, "parses": 24095}
     ]
     
-    # Add timestamp to each entry
+    # Add the same timestamp to each entry
+    scraped_at = datetime.utcnow().isoformat()
     for entry in damage_data:
-        entry['scraped_at'] = datetime.utcnow().isoformat()
+        entry['scraped_at'] = scraped_at
     
     return damage_data
 
@@ -3,18 +3,16 @@
 Debug script to examine the HTML structure
 """
 
-import requests
+import wcl_http
+from wcl_http import WCL_BASE_URL
 from bs4 import BeautifulSoup
 
 def debug_wcl_page():
     """Debug the WCL page structure"""
-    url = "https://www.warcraftlogs.com/zone/statistics/42?class=Any"
+    url = f"{WCL_BASE_URL}/zone/statistics/42?class=Any"
     
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=30)
+        response = wcl_http.get(url)
         response.raise_for_status()
         
         soup = BeautifulSoup(response.content, 'html.parser')
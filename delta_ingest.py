@@ -0,0 +1,111 @@
+"""
+Record-level change detection between consecutive WCL snapshots
+
+The manifest keeps one fingerprint per (zone, boss, difficulty, metric,
+partition, class, spec) row so a run only has to ship what moved, and a
+checkpoint counter per table scope so every table gets its periodic full
+snapshot however often the others run.
+"""
+
+import hashlib
+
+# Filters identifying one scraped table; rows of a table are compared as a unit
+SCOPE_FIELDS = ('zone', 'boss', 'difficulty', 'metric', 'partition')
+KEY_FIELDS = SCOPE_FIELDS + ('class', 'spec')
+UNSCOPED = '|' * (len(SCOPE_FIELDS) - 1)
+
+def record_key(entry):
+    """Stable string key for a row; page-mode rows without filters use empty fields"""
+    return '|'.join(str(entry.get(field, '')) for field in KEY_FIELDS)
+
+def scope_of(key):
+    """Table scope part of a record key"""
+    return key.rsplit('|', 2)[0]
+
+def data_scopes(data):
+    """Table scopes of the rows in a run"""
+    return {scope_of(record_key(entry)) for entry in data}
+
+def fingerprint(entry):
+    """Short hash of the values that matter downstream (not the timestamp)"""
+    return hashlib.sha1(f"{entry['score']!r}|{entry['parses']!r}".encode('utf-8')).hexdigest()[:16]
+
+def compute_delta(data, previous_fingerprints):
+    """Return inserted/updated/removed change records against the previous fingerprints"""
+    changes = []
+    current_keys = set()
+    scraped_scopes = set()
+
+    for entry in data:
+        key = record_key(entry)
+        current_keys.add(key)
+        scraped_scopes.add(scope_of(key))
+
+        previous = previous_fingerprints.get(key)
+        if previous is None:
+            changes.append({**entry, 'change': 'insert'})
+        elif previous != fingerprint(entry):
+            changes.append({**entry, 'change': 'update'})
+
+    # Only tables scraped this run can have removals; a failed shard is not a delete
+    scraped_at = data[0]['scraped_at'] if data else None
+    for key in previous_fingerprints:
+        if key not in current_keys and scope_of(key) in scraped_scopes:
+            removed = dict(zip(KEY_FIELDS, key.split('|')))
+            changes.append({**removed, 'change': 'remove', 'scraped_at': scraped_at})
+
+    return changes
+
+def summarize_changes(changes):
+    """Count change records by kind"""
+    summary = {'insert': 0, 'update': 0, 'remove': 0}
+    for change in changes:
+        summary[change['change']] += 1
+    return summary
+
+def checkpoint_due(manifest, data, checkpoint_every):
+    """A full snapshot is due on a table's first run and every `checkpoint_every` runs of it after
+
+    A run covering several tables checkpoints them all once any of them is due.
+    """
+    counters = (manifest or {}).get('scopes', {})
+    return any(
+        scope not in counters or counters[scope].get('runs_since_checkpoint', 0) + 1 >= checkpoint_every
+        for scope in data_scopes(data)
+    )
+
+def update_manifest(manifest, data, file_path, checkpoint):
+    """Fold this run's rows into the manifest, keeping tables that weren't scraped"""
+    manifest = dict(manifest or {})
+    previous_fingerprints = manifest.get('fingerprints', {})
+
+    current = {record_key(entry): fingerprint(entry) for entry in data}
+    scraped_scopes = {scope_of(key) for key in current}
+
+    # Keys with an empty scope predate page imports being tagged with their table and match nothing now
+    fingerprints = {
+        key: value for key, value in previous_fingerprints.items()
+        if scope_of(key) not in scraped_scopes and scope_of(key) != UNSCOPED
+    }
+    fingerprints.update(current)
+
+    manifest['fingerprints'] = fingerprints
+
+    # Only the scraped tables' counters move; manifests from before per-table counters
+    # have none, so each table starts with a checkpoint
+    scopes = {scope: counter for scope, counter in manifest.get('scopes', {}).items() if scope != UNSCOPED}
+    for scope in scraped_scopes:
+        counter = dict(scopes.get(scope, {}))
+        if checkpoint:
+            counter['runs_since_checkpoint'] = 0
+            counter['last_checkpoint'] = file_path
+        else:
+            counter['runs_since_checkpoint'] = counter.get('runs_since_checkpoint', 0) + 1
+            if file_path:
+                counter['last_delta'] = file_path
+        scopes[scope] = counter
+    manifest['scopes'] = scopes
+    for field in ('runs_since_checkpoint', 'last_checkpoint', 'last_delta'):
+        manifest.pop(field, None)
+
+    return manifest
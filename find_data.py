@@ -3,20 +3,17 @@
 Look for JSON data embedded in the page
 """
 
-import requests
+import wcl_http
+import wcl_parsers
+from wcl_http import WCL_BASE_URL
 from bs4 import BeautifulSoup
-import re
-import json
 
 def find_embedded_data():
     """Look for embedded JSON data in the page"""
-    url = "https://www.warcraftlogs.com/zone/statistics/42?class=Any"
+    url = f"{WCL_BASE_URL}/zone/statistics/42?class=Any"
     
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=30)
+        response = wcl_http.get(url)
         response.raise_for_status()
         
         content = response.text
@@ -35,19 +32,15 @@ def find_embedded_data():
                 print(f"\nScript {i+1} contains relevant keywords:")
                 print(script_content[:500] + "..." if len(script_content) > 500 else script_content)
         
-        # Look for specific patterns in the full content
-        json_patterns = [
-            r'window\.__INITIAL_STATE__\s*=\s*({.*?});',
-            r'window\..*?=\s*({.*?"damage".*?});',
-            r'var\s+.*?=\s*({.*?"spec".*?});',
-        ]
-        
-        for pattern in json_patterns:
-            matches = re.findall(pattern, content, re.DOTALL)
-            if matches:
-                print(f"\nFound JSON pattern: {pattern}")
-                for j, match in enumerate(matches[:3]):  # Only show first 3
-                    print(f"Match {j+1}: {match[:200]}...")
+        # Same scan the production extractor runs (wcl_parsers.parse_embedded_state)
+        for offset, value in wcl_parsers.iter_embedded_json(content):
+            rows, keys = wcl_parsers.find_embedded_rows(value)
+            print(f"\nJSON {type(value).__name__} at offset {offset}: {content[offset:offset + 80]!r}")
+            if rows:
+                print(f"  {len(rows)} rows, keys {keys}: {rows[0]}")
+        
+        rows, strategy, timings = wcl_parsers.extract_rows(response.content)
+        print(f"\nExtraction: {len(rows)} rows via {strategy or 'nothing'} {timings}")
         
         # Save full page content for manual inspection
         with open('full_page.html', 'w', encoding='utf-8') as f:
@@ -1,86 +1,348 @@
 import azure.functions as func
 import logging
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd
-from azure.storage.filedatalake import DataLakeServiceClient
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
 import os
 import json
 from datetime import datetime, timezone
-import re
+import threading
+import hashlib
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import product
+from functools import partial
+import wcl_http
+import wcl_cache
+import wcl_metrics
+import wcl_ratelimit
+import wcl_singleflight
+from wcl_http import WCL_BASE_URL
+import wcl_parsers
+from wcl_parsers import extract_rows, iter_summary_cells
+import wcl_normalize
+import wcl_pipeline
+from wcl_records import RawRecordBatch, RecordBatch
+from local_orchestrator import run_orchestration
 
 app = func.FunctionApp(http_auth_level=func.AuthLevel.FUNCTION)
 
+WCL_DEFAULT_ZONE = 42
+
+# Filter defaults as initialised by loadViews() on the zone statistics page
+WCL_TABLE_DEFAULTS = {
+    'metric': 'dps',
+    'boss': 0,
+    'difficulty': 5,
+    'partition': 3,
+    'dataset': 1000,
+    'timespan': 1,
+    'sample': 14,
+    'bracket': 0,
+    'class': 'Any',
+    'spec': 'Any',
+    'combatantinfo': 'All',
+    'tier': 0,
+    'aggregate': 'normalized',
+    'itemleveldisplay': 'single',
+    'kills': 0,
+    'representation': -1,
+    'keystone': 15,
+    'dpstype': 'rdps'
+}
+
+# Filters that identify a table; every batch is tagged with them so sinks
+# partition and key rows by the table they came from
+WCL_TABLE_TAGS = ('metric', 'boss', 'difficulty', 'partition')
+
+# Raid size per difficulty, from the page's `difficulties` list (5 = Mythic)
+WCL_DIFFICULTY_SIZES = {5: 20, 4: 10, 3: 10, 1: 10}
+
+# Encounter IDs from the boss menu of each zone (0 = All Bosses)
+WCL_ZONE_BOSSES = {
+    42: [3009, 3010, 3011, 3012, 3013, 3014, 3015, 3016]
+}
+
+# Storage clients live for the life of the worker process so warm invocations
+# skip client construction and the container existence check
+_data_lake_client = None
+_file_system_clients = {}
+_data_lake_lock = threading.RLock()
+
 def get_data_lake_client():
-    """Initialize and return Data Lake client"""
+    """Initialize and return the cached Data Lake client"""
+    global _data_lake_client
+    
+    if _data_lake_client is not None:
+        return _data_lake_client
+
+    # Local directory stand-in for offline runs and benchmarks
+    if os.environ.get('DATALAKE_LOCAL_ROOT'):
+        import local_datalake
+        with _data_lake_lock:
+            if _data_lake_client is None:
+                _data_lake_client = local_datalake.from_environment()
+        return _data_lake_client
+
     account_name = os.environ.get('DATALAKE_ACCOUNT_NAME')
     account_key = os.environ.get('DATALAKE_ACCOUNT_KEY')
     
     if not account_name or not account_key:
         raise ValueError("Data Lake credentials not configured")
     
-    service_client = DataLakeServiceClient(
-        account_url=f"https://{account_name}.dfs.core.windows.net",
-        credential=account_key
-    )
-    return service_client
+    # The storage SDK is only needed once we upload, so keep it out of cold start
+    from azure.storage.filedatalake import DataLakeServiceClient
+    
+    with _data_lake_lock:
+        if _data_lake_client is None:
+            _data_lake_client = DataLakeServiceClient(
+                account_url=f"https://{account_name}.dfs.core.windows.net",
+                credential=account_key
+            )
+    return _data_lake_client
 
-def scrape_wcl_damage_data():
-    """Scrape damage statistics from Warcraft Logs"""
-    url = "https://www.warcraftlogs.com/zone/statistics/42?class=Any"
+def get_file_system_client(container_name='warcraft-logs-data'):
+    """Return a cached file system client, creating the container once per process"""
+    file_system_client = _file_system_clients.get(container_name)
+    if file_system_client is not None:
+        return file_system_client
     
-    try:
-        # Make request with proper headers to avoid blocking
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
+    with _data_lake_lock:
+        file_system_client = _file_system_clients.get(container_name)
+        if file_system_client is not None:
+            return file_system_client
         
-        # Parse HTML
-        soup = BeautifulSoup(response.content, 'html.parser')
+        file_system_client = get_data_lake_client().get_file_system_client(file_system=container_name)
         
-        # The page uses JavaScript to load data, but we can check for any existing tables
-        # or try to extract data from text content
+        try:
+            file_system_client.create_file_system()
+            logging.info(f"Created container: {container_name}")
+        except ResourceExistsError:
+            pass
+        except Exception as e:
+            # Don't memoize the check so the next invocation tries again
+            logging.warning(f"Container creation issue: {str(e)}")
+            return file_system_client
         
-        # First, try to find the summary table
-        table = soup.find('table', class_='summary-table')
+        _file_system_clients[container_name] = file_system_client
+    return file_system_client
+
+def reset_data_lake_clients():
+    """Drop cached storage clients, e.g. after credentials change or in tests"""
+    global _data_lake_client
+    
+    with _data_lake_lock:
+        _data_lake_client = None
+        _file_system_clients.clear()
+
+class DataUnchanged(Exception):
+    """Raised when WCL data matches the previous run, so there is nothing to ingest"""
+
+class InvalidRequest(ValueError):
+    """Raised for query parameters that can't be turned into a WCL table request"""
+
+# Validators and content hashes from the last ingested run, keyed by table URL
+FETCH_STATE_PATH = "_state/fetch_state.json"
+_fetch_state = None
+_fetch_state_lock = threading.Lock()
+
+def load_fetch_state(container_name='warcraft-logs-data'):
+    """Load the change-detection state, from the lake on a cold start"""
+    global _fetch_state
+    
+    with _fetch_state_lock:
+        if _fetch_state is None:
+            _fetch_state = {}
+            try:
+                file_client = get_file_system_client(container_name).get_file_client(FETCH_STATE_PATH)
+                _fetch_state = json.loads(file_client.download_file().readall())
+            except ResourceNotFoundError:
+                logging.info("No previous fetch state found, starting fresh")
+            except Exception as e:
+                logging.warning(f"Could not load fetch state, change detection limited to this worker: {str(e)}")
+        return _fetch_state
+
+def hash_rows(data):
+    """Hash the scraped values (ignoring timestamps) to detect unchanged data"""
+    rows = sorted((entry['class'], entry['spec'], entry['score'], entry['parses']) for entry in data)
+    return hashlib.sha256(json.dumps(rows).encode('utf-8')).hexdigest()
+
+def commit_fetch_state(key, entry, container_name='warcraft-logs-data'):
+    """Persist one table's new validators once the data they describe is safely in the lake"""
+    state = load_fetch_state(container_name)
+    
+    with _fetch_state_lock:
+        state[key] = entry
+        payload = json.dumps(state)
+    
+    try:
+        file_client = get_file_system_client(container_name).get_file_client(FETCH_STATE_PATH)
+        file_client.upload_data(payload, overwrite=True)
+    except Exception as e:
+        logging.warning(f"Could not persist fetch state: {str(e)}")
+
+def get_table_tags(zone_id=WCL_DEFAULT_ZONE, **filters):
+    """Zone and effective table filters of a scrape, typed like matrix shard tags"""
+    f = dict(WCL_TABLE_DEFAULTS, **filters)
+    tags = {'zone': int(zone_id), 'metric': str(f['metric'])}
+    for key in WCL_TABLE_TAGS[1:]:
+        tags[key] = int(f[key])
+    return tags
+
+def is_default_table(**filters):
+    """True when the filters select the table the statistics page renders without any"""
+    return all(str(value) == str(WCL_TABLE_DEFAULTS.get(key)) for key, value in filters.items())
+
+def build_table_url(zone_id=WCL_DEFAULT_ZONE, **filters):
+    """Build the table fragment URL that loadTable() requests for a set of filters"""
+    f = dict(WCL_TABLE_DEFAULTS, **filters)
+    size = f.get('size') or WCL_DIFFICULTY_SIZES.get(int(f['difficulty']), 10)
+    
+    # Same segment order as the loadString built in loadTable()
+    segments = [
+        zone_id, f['metric'], f['boss'], f['difficulty'], size, f['partition'],
+        f['dataset'], f['timespan'], f['sample'], f['bracket'], f['class'], f['spec'],
+        f['combatantinfo'], f['tier'], f['aggregate'], f['itemleveldisplay'],
+        f['kills'], f['representation']
+    ]
+    path = '/'.join(str(segment) for segment in segments)
+    return f"{WCL_BASE_URL}/zone/statistics/table/{path}/?keystone={f['keystone']}&dpstype={f['dpstype']}"
+
+def fetch_table_fragment(zone_id=WCL_DEFAULT_ZONE, validators=None, stream=False, **filters):
+    """Download only the summary table fragment that the page loads into #table-container"""
+    url = build_table_url(zone_id, **filters)
+    
+    # Match the jQuery .load() request the statistics page itself makes
+    headers = {
+        'X-Requested-With': 'XMLHttpRequest',
+        'Referer': f"{WCL_BASE_URL}/zone/statistics/{zone_id}"
+    }
+    
+    # Let WCL answer 304 Not Modified if the table hasn't changed since the last run
+    if validators:
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+    
+    response = wcl_http.get(url, headers=headers, stream=stream)
+    if response.status_code != 304:
+        try:
+            response.raise_for_status()
+        except Exception:
+            # A streamed response holds its concurrency slot until closed
+            response.close()
+            raise
+    return response
+
+def stream_table_fragment(zone_id=WCL_DEFAULT_ZONE, chunk_size=16384, **filters):
+    """Yield raw (class, spec, score, parses) cells while the fragment downloads, closing the connection once the table ends"""
+    yield from iter_response_cells(fetch_table_fragment(zone_id, stream=True, **filters), chunk_size)
+
+def iter_response_cells(response, chunk_size=16384, digest=None):
+    """Yield raw cells from a streamed response as each row closes; the response is closed once the table ends
+
+    A hashlib digest, if given, is fed every body byte read, up to the end of the table.
+    """
+    metrics = wcl_metrics.current()
+    
+    def counted(chunks):
+        for chunk in chunks:
+            metrics.add('bytes_downloaded', len(chunk))
+            if digest is not None:
+                digest.update(chunk)
+            yield chunk
+    
+    try:
+        # Download and parse interleave here, so the whole stream counts as parse time
+        with metrics.timer('parse_ms'):
+            for cells in iter_summary_cells(counted(response.iter_content(chunk_size)), response.encoding or 'utf-8'):
+                metrics.add('rows_parsed')
+                yield cells
+    finally:
+        metrics.add('wire_bytes', response.raw.tell())
+        response.close()
+
+def scrape_wcl_page(zone_id=WCL_DEFAULT_ZONE, scraped_at=None):
+    """Scrape the summary table from the full zone statistics page"""
+    url = f"{WCL_BASE_URL}/zone/statistics/{zone_id}?class=Any"
+    
+    # The shared session sends browser-like headers to avoid blocking
+    response = wcl_http.get(url)
+    response.raise_for_status()
+    
+    # The page uses JavaScript to load data, but it may embed it as JSON or render a table
+    rows, strategy, timings = extract_rows(response.content, scraped_at)
+    logging.info(f"Full page extraction: {strategy or 'no rows'} {timings}")
+    # The page always renders its default table, whatever filters were asked for
+    rows.tag(**get_table_tags(zone_id))
+    return wcl_normalize.normalize_batch(rows)
+
+def scrape_wcl_damage_data(zone_id=WCL_DEFAULT_ZONE, skip_unchanged=False, **filters):
+    """Scrape damage statistics from Warcraft Logs"""
+    data, _ = scrape_wcl_table(zone_id, skip_unchanged, **filters)
+    return data
+
+def scrape_wcl_table(zone_id=WCL_DEFAULT_ZONE, skip_unchanged=False, **filters):
+    """Scrape one table; returns (data, (state key, validators)) with skip_unchanged, else (data, None)
+
+    The caller commits the validators with commit_fetch_state() only after
+    its own upload succeeds, so a failed upload is retried in full.
+    """
+    from requests import RequestException
+    
+    try:
+        scraped_at = datetime.now(timezone.utc).isoformat()
         data = []
         
-        if table:
-            # Extract data from table
-            tbody = table.find('tbody')
-            if tbody:
-                rows = tbody.find_all('tr')
+        state_key = build_table_url(zone_id, **filters)
+        previous = load_fetch_state().get(state_key, {}) if skip_unchanged else {}
+        current = {}
+        # The full page only ever renders the default table, so it can't stand in for a filtered one
+        default_table = is_default_table(**filters)
+        
+        # The table fragment is a small slice of the page, so try it first
+        try:
+            stream = wcl_parsers.DEFAULT_PARSER_BACKEND == 'stream'
+            response = fetch_table_fragment(zone_id, validators=previous, stream=stream, **filters)
+            if response.status_code == 304:
+                response.close()
+                raise DataUnchanged("Table fragment not modified since the last run")
+            
+            current = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified')
+            }
+            if stream:
+                # Rows are parsed while the body downloads and reading stops at the end of the
+                # table, so the hash covers the bytes up to there
+                digest = hashlib.sha256()
+                rows = RawRecordBatch(scraped_at)
+                for cells in iter_response_cells(response, digest=digest):
+                    rows.append(*cells)
+                rows.source = 'dom'
+                current['body_hash'] = digest.hexdigest()
             else:
-                # If no tbody, get all rows and skip the first one (header)
-                all_rows = table.find_all('tr')
-                rows = all_rows[1:] if len(all_rows) > 1 else []
+                current['body_hash'] = hashlib.sha256(response.content).hexdigest()
+            if skip_unchanged and previous.get('body_hash') == current['body_hash']:
+                raise DataUnchanged("Table fragment identical to the last run")
             
-            for row in rows:
-                cells = row.find_all('td')
-                if len(cells) >= 5:  # Ensure we have all required columns
-                    # Extract text content only, removing images and extra whitespace
-                    class_name = cells[0].get_text(strip=True)
-                    spec_name = cells[1].get_text(strip=True)
-                    score = cells[2].get_text(strip=True)
-                    # Skip max column (cells[3])
-                    parses = cells[4].get_text(strip=True)
-                    
-                    # Clean numeric values
-                    score_clean = re.sub(r'[^\d.]', '', score)
-                    parses_clean = re.sub(r'[^\d,]', '', parses).replace(',', '')
-                    
-                    data.append({
-                        'class': class_name,
-                        'spec': spec_name,
-                        'score': float(score_clean) if score_clean else 0.0,
-                        'parses': int(parses_clean) if parses_clean else 0,
-                        'scraped_at': datetime.now(timezone.utc).isoformat()
-                    })
-        
-        # If no table found or no data extracted, try alternative method
-        if not data:
+            if not stream:
+                # Embedded JSON first, then the table DOM, then a text rendering (see wcl_parsers.EXTRACTION_STRATEGIES)
+                rows, strategy, timings = extract_rows(response.content, scraped_at)
+                logging.info(f"Table fragment extraction: {strategy or 'no rows'} {timings}")
+            rows.tag(**get_table_tags(zone_id, **filters))
+            data = wcl_normalize.normalize_batch(rows)
+        except RequestException as e:
+            if not default_table:
+                raise
+            logging.warning(f"Table fragment request failed, falling back to full page: {str(e)}")
+        
+        if not data and default_table:
+            logging.info("No rows in table fragment, scraping full statistics page")
+            data = scrape_wcl_page(zone_id, scraped_at)
+        
+        # If no table found or no data extracted, try alternative method.
+        # The sample rows are the default zone's default table, so no other table may get them.
+        if not data and default_table and int(zone_id) == WCL_DEFAULT_ZONE:
             # For now, return sample data - in production you'd implement more robust scraping
             # or use an API if available
             logging.warning("Could not find summary table, using fallback data extraction")
@@ -129,42 +391,241 @@ def scrape_wcl_damage_data():
                 {"class": "Priest", "spec": "Holy", "score": 3.08, "parses": 24095}
             ]
             
-            # Add timestamp to each entry
-            for entry in data:
-                entry['scraped_at'] = datetime.now(timezone.utc).isoformat()
+            # One timestamp for the whole batch rather than a copy on each entry
+            data = RecordBatch.from_dicts(data, scraped_at, **get_table_tags(zone_id))
+            data.source = 'fallback'
+            wcl_metrics.current().add('extracted_by_fallback')
+        
+        if not data:
+            # Nothing is uploaded, cached or committed for a table that came back empty
+            logging.warning(f"No rows found for {state_key}")
+            return data, None
+        
+        # Servers without validators still get caught here, before any upload
+        if skip_unchanged:
+            current['rows_hash'] = hash_rows(data)
+            if previous.get('rows_hash') == current['rows_hash']:
+                # Nothing to upload, so the new validators can be kept right away
+                commit_fetch_state(state_key, current)
+                raise DataUnchanged("Scraped rows identical to the last run")
+            return data, (state_key, current)
         
-        return data
+        return data, None
         
+    except DataUnchanged:
+        raise
     except Exception as e:
         logging.error(f"Error scraping WCL data: {str(e)}")
         raise
 
+def build_snapshot(data):
+    """Serialize scraped rows once for read mode; returns (JSON body, weak ETag over the values)"""
+    body = json.dumps({
+        "records": len(data),
+        "scraped_at": data[0]['scraped_at'] if len(data) else None,
+        "extracted_by": getattr(data, 'source', None),
+        "data": list(data)
+    })
+    # Timestamps are left out of the hash, so an identical re-scrape keeps the ETag
+    return body, f'W/"{hash_rows(data)[:32]}"'
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag.removeprefix('W/') in [tag.removeprefix('W/') for tag in tags]
+
+def get_max_concurrency():
+    """Return the fan-out concurrency cap from settings"""
+    return max(1, int(os.environ.get('WCL_MAX_CONCURRENCY', '8')))
+
+def build_scrape_matrix(zone_id=WCL_DEFAULT_ZONE, bosses=None, difficulties=None, metrics=None, partitions=None):
+    """Expand bosses x difficulties x metrics x partitions into table requests"""
+    if bosses is None:
+        bosses = [0] + WCL_ZONE_BOSSES.get(zone_id, [])
+    difficulties = difficulties or [WCL_TABLE_DEFAULTS['difficulty']]
+    metrics = metrics or [WCL_TABLE_DEFAULTS['metric']]
+    partitions = partitions or [WCL_TABLE_DEFAULTS['partition']]
+    
+    return [
+        {'zone': zone_id, 'boss': boss, 'difficulty': difficulty, 'metric': metric, 'partition': partition}
+        for boss, difficulty, metric, partition in product(bosses, difficulties, metrics, partitions)
+    ]
+
+def scrape_table_shard(shard, scraped_at=None, normalize=True):
+    """Fetch and parse a single table fragment, tagging rows with their filters
+
+    With normalize=False the raw cell text is returned so a whole matrix run
+    can be cleaned and validated in one pass.
+    """
+    filters = {key: value for key, value in shard.items() if key != 'zone'}
+    
+    if wcl_parsers.DEFAULT_PARSER_BACKEND == 'stream':
+        data = RawRecordBatch(scraped_at)
+        for cells in stream_table_fragment(shard['zone'], **filters):
+            data.append(*cells)
+        data.source = 'dom'
+    else:
+        data, _, _ = extract_rows(fetch_table_fragment(shard['zone'], **filters).content, scraped_at)
+    # Filters are stored once on the batch, not copied into every row
+    data.tag(**shard)
+    return wcl_normalize.normalize_batch(data) if normalize else data
+
+def scrape_wcl_matrix(shards, max_concurrency=None):
+    """Scrape many table fragments concurrently with a bounded thread pool"""
+    if max_concurrency is None:
+        max_concurrency = get_max_concurrency()
+    
+    # One timestamp for the whole run so every shard lines up downstream
+    scraped_at = datetime.now(timezone.utc).isoformat()
+    raw_batches = []
+    failures = []
+    
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, max(len(shards), 1))) as executor:
+        scrape = wcl_metrics.propagate(scrape_table_shard)
+        futures = {executor.submit(scrape, shard, scraped_at, False): shard for shard in shards}
+        
+        for future in as_completed(futures):
+            shard = futures[future]
+            try:
+                raw_batches.append(future.result())
+            except Exception as e:
+                logging.error(f"Error scraping shard {shard}: {str(e)}")
+                failures.append({**shard, 'error': str(e)})
+    
+    # Clean and validate every shard's numbers in one vectorized pass
+    data = wcl_normalize.normalize_batches(raw_batches)
+    
+    logging.info(f"Scraped {len(shards) - len(failures)}/{len(shards)} shards ({len(data)} records)")
+    logging.info(f"Rate limiter: {wcl_ratelimit.get_rate_limiter().snapshot()}")
+    return data, failures
+
+def parse_shard_fragment(shard, content, scraped_at=None):
+    """Extract, tag and validate one shard's fragment; module level so a process pool can run it"""
+    data, _, _ = extract_rows(content, scraped_at)
+    data.tag(**shard)
+    return wcl_normalize.normalize_batch(data)
+
+def run_matrix_pipeline(shards, output_format='json', max_concurrency=None):
+    """Scrape and upload shards with fetching, parsing and uploading overlapped (see wcl_pipeline)
+
+    Each shard is stored as its own object(s) as soon as it is parsed, so
+    nothing waits for the slowest fetch. Returns a summarize_import()-style
+    result with pipeline stage stats.
+    """
+    scraped_at = datetime.now(timezone.utc).isoformat()
+    run_id = get_output_stamp()
+    
+    def fetch(shard):
+        filters = {key: value for key, value in shard.items() if key != 'zone'}
+        return fetch_table_fragment(shard['zone'], **filters).content
+    
+    def upload(shard, data):
+        # Only what the response needs travels on; the rows are done with
+        return {
+            'file_paths': upload_shard(shard, data, output_format, run_id) if len(data) else [],
+            'records': len(data),
+            'sample': data[:3],
+            'rejected': data.rejected,
+            'source': data.source
+        }
+    
+    completed, failures, stats = wcl_pipeline.run_pipeline(
+        shards,
+        fetch,
+        partial(parse_shard_fragment, scraped_at=scraped_at),
+        upload,
+        fetch_workers=max_concurrency or get_max_concurrency()
+    )
+    shard_results = [result for _, result in completed]
+    records = sum(result['records'] for result in shard_results)
+    rejected = [row for result in shard_results for row in result['rejected']]
+    
+    logging.info(f"Pipelined {len(shards) - len(failures)}/{len(shards)} shards ({records} records): {stats}")
+    logging.info(f"Rate limiter: {wcl_ratelimit.get_rate_limiter().snapshot()}")
+    if not records:
+        return {"status": "empty", "records_processed": 0}
+    
+    result = {
+        "status": "success",
+        "records_processed": records,
+        "file_path": [path for result in shard_results for path in result['file_paths']],
+        "sample_data": [row for result in shard_results for row in result['sample']][:3],
+        "shards_failed": failures,
+        "rate_limiter": wcl_ratelimit.get_rate_limiter().snapshot(),
+        "pipeline": stats
+    }
+    if rejected:
+        result["rows_rejected"] = len(rejected)
+        result["rejected_sample"] = rejected[:20]
+    return result
+
+def _parse_int(name, value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise InvalidRequest(f"'{name}' must be an integer, got {value!r}")
+
+def _parse_word(name, value):
+    # Filters become URL path segments, so only plain ASCII words ("dps", "DeathKnight")
+    if isinstance(value, str) and value.isascii() and value.isalnum():
+        return value
+    raise InvalidRequest(f"'{name}' must be a plain word, got {value!r}")
+
+def _parse_list_param(value, cast=_parse_int, name='list'):
+    """Split a comma separated query parameter into a validated list; raises InvalidRequest"""
+    if not value:
+        return None
+    return [cast(name, item.strip()) for item in value.split(',') if item.strip()]
+
+def parse_table_params(params):
+    """(zone, filters) of a page or snapshot request, typed like WCL_TABLE_DEFAULTS; raises InvalidRequest"""
+    zone_id = _parse_int('zone', params.get('zone', WCL_DEFAULT_ZONE))
+    filters = {}
+    for key, default in WCL_TABLE_DEFAULTS.items():
+        if key in params:
+            filters[key] = (_parse_int if isinstance(default, int) else _parse_word)(key, params[key])
+    return zone_id, filters
+
+def bad_request(e):
+    """400 response for an InvalidRequest, shaped like the 500 error responses"""
+    logging.warning(f"Rejected request: {str(e)}")
+    return func.HttpResponse(
+        json.dumps({
+            "status": "error",
+            "error": f"Invalid request: {str(e)}",
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        }),
+        status_code=400,
+        mimetype="application/json"
+    )
+
+def get_output_stamp():
+    """UTC timestamp plus a random suffix, so outputs written in the same second never share a name"""
+    return f"{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
 def upload_to_data_lake(data, container_name='warcraft-logs-data'):
     """Upload scraped data to Azure Data Lake"""
     try:
-        # Get Data Lake client
-        service_client = get_data_lake_client()
-        
-        # Get or create container
-        file_system_client = service_client.get_file_system_client(file_system=container_name)
-        
-        try:
-            file_system_client.create_file_system()
-            logging.info(f"Created container: {container_name}")
-        except Exception as e:
-            if "ContainerAlreadyExists" not in str(e):
-                logging.warning(f"Container creation issue: {str(e)}")
+        # Get or create container (cached after the first invocation)
+        file_system_client = get_file_system_client(container_name)
         
-        # Create filename with timestamp
-        timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+        # Create filename with timestamp; page, matrix and delta imports can finish in the same second
+        timestamp = get_output_stamp()
         file_path = f"mythic_damage_stats/mythic_damage_{timestamp}.json"
         
+        metrics = wcl_metrics.current()
+        
         # Convert data to JSON
-        json_data = json.dumps(data, indent=2)
+        with metrics.timer('serialize_ms'):
+            json_data = json.dumps(list(data), indent=2)
         
         # Upload to Data Lake
-        file_client = file_system_client.get_file_client(file_path)
-        file_client.upload_data(json_data, overwrite=True)
+        with metrics.timer('upload_ms'):
+            file_client = file_system_client.get_file_client(file_path)
+            file_client.upload_data(json_data, overwrite=True)
+        metrics.add('upload_bytes', len(json_data))
         
         logging.info(f"Successfully uploaded data to: {file_path}")
         return file_path
@@ -173,35 +634,450 @@ def upload_to_data_lake(data, container_name='warcraft-logs-data'):
         logging.error(f"Error uploading to Data Lake: {str(e)}")
         raise
 
-@app.route(route="wcl_data_importer_http_trigger")
-def wcl_data_importer_http_trigger(req: func.HttpRequest) -> func.HttpResponse:
+def upload_parquet_to_data_lake(data, container_name='warcraft-logs-data'):
+    """Upload scraped data as zone/metric/date partitioned Parquet files"""
+    try:
+        # Imported here so JSON-only runs don't pay for loading pyarrow
+        import lake_sinks
+        
+        metrics = wcl_metrics.current()
+        file_system_client = get_file_system_client(container_name)
+        with metrics.timer('serialize_ms'):
+            files = lake_sinks.build_parquet_partitions(data, run_timestamp=get_output_stamp())
+        
+        for file_path, payload in files.items():
+            with metrics.timer('upload_ms'):
+                file_client = file_system_client.get_file_client(file_path)
+                file_client.upload_data(payload, overwrite=True)
+            metrics.add('upload_bytes', len(payload))
+        
+        logging.info(f"Successfully uploaded {len(files)} Parquet partitions to: {lake_sinks.PARQUET_ROOT}")
+        return list(files)
+        
+    except Exception as e:
+        logging.error(f"Error uploading Parquet to Data Lake: {str(e)}")
+        raise
+
+def stream_ndjson_to_data_lake(records, container_name='warcraft-logs-data', compression=None):
+    """Stream records to the lake as compressed NDJSON using chunked append/flush"""
+    try:
+        import lake_sinks
+        
+        compression = compression or lake_sinks.NDJSON_COMPRESSION
+        file_system_client = get_file_system_client(container_name)
+        
+        timestamp = get_output_stamp()
+        file_path = f"mythic_damage_stats/mythic_damage_{timestamp}{lake_sinks.NDJSON_EXTENSIONS[compression]}"
+        
+        metrics = wcl_metrics.current()
+        file_client = file_system_client.get_file_client(file_path)
+        with metrics.timer('upload_ms'):
+            file_client.create_file()
+        
+        # Each append lands at the current end of the file; nothing is committed until flush
+        offset = 0
+        chunks = lake_sinks.iter_ndjson_chunks(records, compression)
+        while True:
+            # Serialization runs lazily between appends, so time the two separately
+            with metrics.timer('serialize_ms'):
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            with metrics.timer('upload_ms'):
+                file_client.append_data(chunk, offset=offset, length=len(chunk))
+            offset += len(chunk)
+        with metrics.timer('upload_ms'):
+            file_client.flush_data(offset)
+        metrics.add('upload_bytes', offset)
+        
+        logging.info(f"Successfully streamed {offset} bytes to: {file_path}")
+        return file_path
+        
+    except Exception as e:
+        logging.error(f"Error streaming NDJSON to Data Lake: {str(e)}")
+        raise
+
+DELTA_MANIFEST_PATH = "_state/delta_manifest.json"
+# Manifest updates from concurrent imports (any table, any instance) take turns under this lease
+DELTA_LEASE_POLL_SECONDS = float(os.environ.get('WCL_DELTA_LEASE_POLL_SECONDS', '0.2'))
+
+def upload_delta_to_data_lake(data, container_name='warcraft-logs-data'):
+    """Upload only rows that changed since the last snapshot, with periodic full checkpoints"""
+    try:
+        import delta_ingest
+        
+        file_system_client = get_file_system_client(container_name)
+        manifest_client = file_system_client.get_file_client(DELTA_MANIFEST_PATH)
+        lease = wcl_singleflight.BlobLease(lambda: file_system_client, poll=DELTA_LEASE_POLL_SECONDS)
+        
+        # Read, diff, upload and write back under the lease so no import's fingerprints are lost
+        with lease.hold(DELTA_MANIFEST_PATH):
+            try:
+                manifest = json.loads(manifest_client.download_file().readall())
+            except ResourceNotFoundError:
+                manifest = None
+            
+            checkpoint_every = int(os.environ.get('WCL_DELTA_CHECKPOINT_EVERY', '24'))
+            checkpoint = delta_ingest.checkpoint_due(manifest, data, checkpoint_every)
+            
+            if checkpoint:
+                # Full snapshot in the usual place so readers can rebuild from it
+                file_path = upload_to_data_lake(data, container_name)
+                summary = {'mode': 'checkpoint', 'records': len(data)}
+            else:
+                changes = delta_ingest.compute_delta(data, manifest.get('fingerprints', {}))
+                summary = {'mode': 'delta', **delta_ingest.summarize_changes(changes)}
+                file_path = None
+                
+                if changes:
+                    timestamp = get_output_stamp()
+                    file_path = f"mythic_damage_delta/mythic_damage_delta_{timestamp}.json"
+                    metrics = wcl_metrics.current()
+                    with metrics.timer('serialize_ms'):
+                        payload = json.dumps(changes, indent=2)
+                    with metrics.timer('upload_ms'):
+                        file_client = file_system_client.get_file_client(file_path)
+                        file_client.upload_data(payload, overwrite=True)
+                    metrics.add('upload_bytes', len(payload))
+                    logging.info(f"Successfully uploaded {len(changes)} changed rows to: {file_path}")
+                else:
+                    logging.info("No rows changed since the last snapshot, nothing uploaded")
+            
+            # Only advance the manifest once the data it describes is stored
+            manifest = delta_ingest.update_manifest(manifest, data, file_path, checkpoint)
+            manifest_client.upload_data(json.dumps(manifest), overwrite=True)
+        
+        return file_path, summary
+        
+    except Exception as e:
+        logging.error(f"Error uploading delta to Data Lake: {str(e)}")
+        raise
+
+MATRIX_CHECKPOINT_DIR = "_state/matrix_runs"
+MATRIX_OUTPUT_ROOT = "mythic_damage_matrix"
+
+def get_matrix_settings(overrides=None):
+    """Matrix dimensions for scheduled runs, from app settings"""
+    settings = {
+        'zone_id': int(os.environ.get('WCL_MATRIX_ZONE', WCL_DEFAULT_ZONE)),
+        'bosses': _parse_list_param(os.environ.get('WCL_MATRIX_BOSSES'), name='WCL_MATRIX_BOSSES'),
+        'difficulties': _parse_list_param(os.environ.get('WCL_MATRIX_DIFFICULTIES'), name='WCL_MATRIX_DIFFICULTIES'),
+        'metrics': _parse_list_param(os.environ.get('WCL_MATRIX_METRICS'), _parse_word, 'WCL_MATRIX_METRICS'),
+        'partitions': _parse_list_param(os.environ.get('WCL_MATRIX_PARTITIONS'), name='WCL_MATRIX_PARTITIONS'),
+        'batch_size': int(os.environ.get('WCL_MATRIX_BATCH_SIZE', '32'))
+    }
+    settings.update(overrides or {})
+    return settings
+
+def get_shard_id(shard):
+    """Stable identifier for a matrix shard, used in checkpoints and file names"""
+    return f"{shard['zone']}-{shard['boss']}-{shard['difficulty']}-{shard['metric']}-{shard['partition']}"
+
+def read_matrix_checkpoint(run_id, container_name='warcraft-logs-data'):
+    """Load the progress record of a matrix run, or None if it hasn't started"""
+    file_client = get_file_system_client(container_name).get_file_client(f"{MATRIX_CHECKPOINT_DIR}/{run_id}.json")
+    try:
+        return json.loads(file_client.download_file().readall())
+    except ResourceNotFoundError:
+        return None
+
+def write_matrix_checkpoint(checkpoint, container_name='warcraft-logs-data'):
+    """Persist the progress record of a matrix run"""
+    file_client = get_file_system_client(container_name).get_file_client(f"{MATRIX_CHECKPOINT_DIR}/{checkpoint['run_id']}.json")
+    file_client.upload_data(json.dumps(checkpoint, indent=2), overwrite=True)
+
+def upload_shard(shard, data, output_format='json', run_id=None):
+    """Store one shard's rows as their own object(s) in the lake; returns the paths written"""
+    file_system_client = get_file_system_client()
+    shard_id = get_shard_id(shard)
+    metrics = wcl_metrics.current()
+    
+    if output_format == 'parquet':
+        import lake_sinks
+        with metrics.timer('serialize_ms'):
+            files = lake_sinks.build_parquet_partitions(data, run_timestamp=f"{run_id}_{shard_id}")
+    elif output_format == 'ndjson':
+        import lake_sinks
+        compression = lake_sinks.NDJSON_COMPRESSION
+        with metrics.timer('serialize_ms'):
+            payload = b''.join(lake_sinks.iter_ndjson_chunks(data, compression))
+        files = {f"{MATRIX_OUTPUT_ROOT}/run={run_id}/{shard_id}{lake_sinks.NDJSON_EXTENSIONS[compression]}": payload}
+    else:
+        with metrics.timer('serialize_ms'):
+            payload = json.dumps(list(data), indent=2)
+        files = {f"{MATRIX_OUTPUT_ROOT}/run={run_id}/{shard_id}.json": payload}
+    
+    for file_path, payload in files.items():
+        with metrics.timer('upload_ms'):
+            file_system_client.get_file_client(file_path).upload_data(payload, overwrite=True)
+        metrics.add('upload_bytes', len(payload))
+    return list(files)
+
+def plan_matrix_run_activity(payload):
+    """Expand the matrix and drop shards an earlier attempt of this run already finished"""
+    run_id = payload['run_id']
+    settings = get_matrix_settings(payload.get('settings'))
+    
+    checkpoint = read_matrix_checkpoint(run_id)
+    if checkpoint is None:
+        checkpoint = {
+            'run_id': run_id,
+            'scraped_at': datetime.now(timezone.utc).isoformat(),
+            'completed': {},
+            'failed': {}
+        }
+        write_matrix_checkpoint(checkpoint)
+    else:
+        logging.info(f"Resuming matrix run {run_id} with {len(checkpoint['completed'])} shards already done")
+    
+    shards = build_scrape_matrix(
+        zone_id=settings['zone_id'],
+        bosses=settings['bosses'],
+        difficulties=settings['difficulties'],
+        metrics=settings['metrics'],
+        partitions=settings['partitions']
+    )
+    pending = [shard for shard in shards if get_shard_id(shard) not in checkpoint['completed']]
+    
+    return {
+        'run_id': run_id,
+        'scraped_at': checkpoint['scraped_at'],
+        'pending': pending,
+        'total': len(shards),
+        'batch_size': max(1, settings['batch_size'])
+    }
+
+def scrape_matrix_shard_activity(payload):
+    """Scrape one shard and store its rows; errors are returned, not raised, so one shard can't fail the batch"""
+    shard = payload['shard']
+    shard_id = get_shard_id(shard)
+    
+    try:
+        data = scrape_table_shard(shard, payload['scraped_at'])
+        file_path, = upload_shard(shard, data, 'json', payload['run_id'])
+        
+        return {'shard_id': shard_id, 'file_path': file_path, 'records': len(data)}
+        
+    except Exception as e:
+        logging.error(f"Error processing shard {shard_id}: {str(e)}")
+        return {'shard_id': shard_id, 'error': str(e)}
+
+def checkpoint_matrix_run_activity(payload):
+    """Record a finished batch so a retried run skips it"""
+    checkpoint = read_matrix_checkpoint(payload['run_id'])
+    
+    for result in payload['results']:
+        if 'error' in result:
+            checkpoint['failed'][result['shard_id']] = result['error']
+        else:
+            checkpoint['completed'][result['shard_id']] = {
+                'file_path': result['file_path'],
+                'records': result['records']
+            }
+            checkpoint['failed'].pop(result['shard_id'], None)
+    
+    write_matrix_checkpoint(checkpoint)
+    return {'completed': len(checkpoint['completed']), 'failed': len(checkpoint['failed'])}
+
+def finalize_matrix_run_activity(payload):
+    """Close out a matrix run and summarize it"""
+    checkpoint = read_matrix_checkpoint(payload['run_id'])
+    checkpoint['finished_at'] = datetime.now(timezone.utc).isoformat()
+    write_matrix_checkpoint(checkpoint)
+    
+    return {
+        'run_id': checkpoint['run_id'],
+        'shards_completed': len(checkpoint['completed']),
+        'shards_failed': checkpoint['failed'],
+        'records_processed': sum(shard['records'] for shard in checkpoint['completed'].values())
+    }
+
+MATRIX_ACTIVITIES = {
+    'plan_matrix_run': plan_matrix_run_activity,
+    'scrape_matrix_shard': scrape_matrix_shard_activity,
+    'checkpoint_matrix_run': checkpoint_matrix_run_activity,
+    'finalize_matrix_run': finalize_matrix_run_activity
+}
+
+def wcl_matrix_orchestration(context):
+    """Fan matrix shards out to activity workers in batches, checkpointing each batch"""
+    orchestration_input = context.get_input() or {}
+    plan = yield context.call_activity('plan_matrix_run', orchestration_input)
+    
+    pending = plan['pending']
+    batch_size = plan['batch_size']
+    
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        tasks = [
+            context.call_activity('scrape_matrix_shard', {
+                'run_id': plan['run_id'],
+                'scraped_at': plan['scraped_at'],
+                'shard': shard
+            })
+            for shard in batch
+        ]
+        results = yield context.task_all(tasks)
+        
+        progress = yield context.call_activity('checkpoint_matrix_run', {
+            'run_id': plan['run_id'],
+            'results': results
+        })
+        context.set_custom_status({**progress, 'total': plan['total']})
+    
+    summary = yield context.call_activity('finalize_matrix_run', {'run_id': plan['run_id']})
+    return summary
+
+def run_matrix_locally(run_id=None, settings=None, max_concurrency=None):
+    """Run the scheduled matrix orchestration in-process, without the Durable runtime"""
+    if run_id is None:
+        run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H")
+    
+    return run_orchestration(
+        wcl_matrix_orchestration,
+        MATRIX_ACTIVITIES,
+        {'run_id': run_id, 'settings': settings},
+        max_concurrency=max_concurrency or get_max_concurrency(),
+        instance_id=f"wcl-matrix-{run_id}"
+    )
+
+def compact_data_lake(day=None, container_name='warcraft-logs-data', dry_run=False):
+    """Merge a day's small snapshot files (yesterday by default) into one Parquet file per partition"""
+    try:
+        import lake_compaction
+        return lake_compaction.compact_day(get_file_system_client(container_name), day, dry_run=dry_run)
+        
+    except Exception as e:
+        logging.error(f"Error compacting Data Lake: {str(e)}")
+        raise
+
+@app.timer_trigger(schedule="0 30 0 * * *", arg_name="timer", run_on_startup=False)
+def wcl_compaction_timer_trigger(timer: func.TimerRequest) -> None:
+    # Shortly after midnight UTC, once yesterday's runs have all landed
+    with wcl_metrics.invocation('wcl_compaction'):
+        compact_data_lake()
+
+def upload_records(damage_data, output_format='json', delta=False):
+    """Upload with the requested sink; returns (file path, delta summary or None)"""
+    logging.info("Uploading data to Azure Data Lake...")
+    if delta:
+        return upload_delta_to_data_lake(damage_data)
+    if output_format == 'parquet':
+        return upload_parquet_to_data_lake(damage_data), None
+    if output_format == 'ndjson':
+        return stream_ndjson_to_data_lake(damage_data), None
+    return upload_to_data_lake(damage_data), None
+
+def summarize_import(damage_data, file_path, delta_summary=None):
+    """JSON-safe outcome of an import, shared with coalesced requests"""
+    result = {
+        "status": "success",
+        "records_processed": len(damage_data),
+        "file_path": file_path,
+        "sample_data": damage_data[:3]
+    }
+    if delta_summary:
+        result["delta"] = delta_summary
+    if getattr(damage_data, 'source', None):
+        result["extracted_by"] = damage_data.source
+    
+    # Rows dropped by validation are reported, never silently zeroed
+    rejected = getattr(damage_data, 'rejected', [])
+    if rejected:
+        result["rows_rejected"] = len(rejected)
+        result["rejected_sample"] = rejected[:20]
+    return result
+
+def ingest_page(zone_id, filters, force=False, output_format='json', delta=False):
+    """Scrape one table and upload it; returns the summarize_import() result"""
+    logging.info("Starting to scrape WCL damage data...")
+    try:
+        damage_data, fetch_state = scrape_wcl_table(zone_id, skip_unchanged=not force, **filters)
+    except DataUnchanged as e:
+        logging.info(f"Skipping import: {str(e)}")
+        return {"status": "unchanged", "reason": str(e)}
+    
+    if not damage_data:
+        return {"status": "empty", "records_processed": 0}
+    logging.info(f"Successfully scraped {len(damage_data)} records")
+    
+    file_path, delta_summary = upload_records(damage_data, output_format, delta)
+    
+    # Only remember this table's validators once the data they describe is stored
+    if fetch_state:
+        commit_fetch_state(*fetch_state)
+    # Read mode can serve what was just ingested without scraping again
+    wcl_cache.get_snapshot_cache().put(build_table_url(zone_id, **filters), *build_snapshot(damage_data))
+    return summarize_import(damage_data, file_path, delta_summary)
+
+# Concurrent page imports of the same table share one scrape and upload
+# (across instances too with WCL_SINGLEFLIGHT_LEASE=true)
+_page_imports = wcl_singleflight.SingleFlight(
+    wcl_singleflight.BlobLease(get_file_system_client) if wcl_singleflight.WCL_SINGLEFLIGHT_LEASE else None
+)
+
+def import_wcl_data(req: func.HttpRequest) -> func.HttpResponse:
+    """Scrape and upload for one HTTP request; include_metrics=true adds this invocation's metrics to the response"""
     logging.info('WCL Data Importer function triggered.')
 
     try:
         # Scrape data from Warcraft Logs
-        logging.info("Starting to scrape WCL damage data...")
-        damage_data = scrape_wcl_damage_data()
+        mode = req.params.get('mode', 'page')
+        # Not `metrics`: in matrix mode that is the list of WCL metrics (dps, hps) to scrape
+        include_metrics = req.params.get('include_metrics', os.environ.get('WCL_METRICS_IN_RESPONSE', 'false')) == 'true'
+        output_format = req.params.get('format', os.environ.get('WCL_LAKE_FORMAT', 'json'))
+        delta = req.params.get('delta', os.environ.get('WCL_DELTA_MODE', 'false')) == 'true'
+        
+        if mode == 'matrix':
+            shards = build_scrape_matrix(
+                zone_id=_parse_int('zone', req.params.get('zone', WCL_DEFAULT_ZONE)),
+                bosses=_parse_list_param(req.params.get('bosses'), name='bosses'),
+                difficulties=_parse_list_param(req.params.get('difficulties'), name='difficulties'),
+                metrics=_parse_list_param(req.params.get('metrics'), _parse_word, 'metrics'),
+                partitions=_parse_list_param(req.params.get('partitions'), name='partitions')
+            )
+            max_concurrency = req.params.get('concurrency')
+            max_concurrency = _parse_int('concurrency', max_concurrency) if max_concurrency else None
+            logging.info(f"Starting to scrape {len(shards)} WCL table shards...")
+            
+            # Delta mode diffs the whole run at once, so it can't be pipelined per shard
+            if req.params.get('pipeline', os.environ.get('WCL_MATRIX_PIPELINE', 'false')) == 'true' and not delta:
+                result = run_matrix_pipeline(shards, output_format, max_concurrency)
+                damage_data = None
+            else:
+                damage_data, failed_shards = scrape_wcl_matrix(shards, max_concurrency=max_concurrency)
+            
+            if damage_data:
+                logging.info(f"Successfully scraped {len(damage_data)} records")
+                result = summarize_import(damage_data, *upload_records(damage_data, output_format, delta))
+                result["shards_failed"] = failed_shards
+                result["rate_limiter"] = wcl_ratelimit.get_rate_limiter().snapshot()
+            elif damage_data is not None:
+                result = {"status": "empty", "records_processed": 0}
+        else:
+            zone_id, filters = parse_table_params(req.params)
+            force = req.params.get('force') == 'true'
+            
+            # Requests that differ only in output options must not share an upload
+            flight_key = f"{build_table_url(zone_id, **filters)}|{output_format}|delta={delta}|force={force}"
+            result, coalesced = _page_imports.do(
+                flight_key,
+                lambda: ingest_page(zone_id, filters, force, output_format, delta)
+            )
+            if coalesced:
+                logging.info(f"Shared the result of an in-flight import of {flight_key}")
+                wcl_metrics.current().add('imports_coalesced')
+                result = {**result, "coalesced": True}
         
-        if not damage_data:
+        if result["status"] == "empty":
             return func.HttpResponse(
                 "No data scraped from Warcraft Logs",
                 status_code=400
             )
         
-        logging.info(f"Successfully scraped {len(damage_data)} records")
-        
-        # Upload to Data Lake
-        logging.info("Uploading data to Azure Data Lake...")
-        file_path = upload_to_data_lake(damage_data)
-        
-        # Return success response
-        response_data = {
-            "status": "success",
-            "records_processed": len(damage_data),
-            "file_path": file_path,
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "sample_data": damage_data[:3] if len(damage_data) >= 3 else damage_data
-        }
+        response_data = {**result, "timestamp": datetime.now(timezone.utc).isoformat()}
+        if include_metrics:
+            response_data["metrics"] = wcl_metrics.current().snapshot()
         
         return func.HttpResponse(
             json.dumps(response_data, indent=2),
@@ -209,6 +1085,8 @@ def wcl_data_importer_http_trigger(req: func.HttpRequest) -> func.HttpResponse:
             mimetype="application/json"
         )
         
+    except InvalidRequest as e:
+        return bad_request(e)
     except Exception as e:
         error_msg = f"Error processing WCL data import: {str(e)}"
         logging.error(error_msg)
@@ -221,4 +1099,69 @@ def wcl_data_importer_http_trigger(req: func.HttpRequest) -> func.HttpResponse:
             }),
             status_code=500,
             mimetype="application/json"
-        )
\ No newline at end of file
+        )
+
+def serve_wcl_snapshot(req: func.HttpRequest) -> func.HttpResponse:
+    """Read mode: the latest parsed snapshot from the process cache, scraping only when it has expired"""
+    try:
+        zone_id, filters = parse_table_params(req.params)
+    except InvalidRequest as e:
+        return bad_request(e)
+    cache = wcl_cache.get_snapshot_cache()
+    
+    def load():
+        data = scrape_wcl_damage_data(zone_id, **filters)
+        if not data:
+            # Never cache an empty table; the next request scrapes again
+            raise ValueError("No data scraped from Warcraft Logs")
+        return build_snapshot(data)
+    
+    try:
+        entry, state = cache.get(build_table_url(zone_id, **filters), load)
+    except Exception as e:
+        error_msg = f"Error loading WCL snapshot: {str(e)}"
+        logging.error(error_msg)
+        return func.HttpResponse(
+            json.dumps({
+                "status": "error",
+                "error": error_msg,
+                "timestamp": datetime.now(timezone.utc).isoformat()
+            }),
+            status_code=500,
+            mimetype="application/json"
+        )
+    
+    wcl_metrics.current().add(f'cache_{state}')
+    age = entry.age()
+    headers = {
+        'ETag': entry.etag,
+        'Cache-Control': f"max-age={max(0, int(cache.ttl - age))}, stale-while-revalidate={int(cache.stale)}",
+        'Age': str(int(age)),
+        'X-Cache': state
+    }
+    
+    if etag_matches(req.headers.get('If-None-Match'), entry.etag):
+        return func.HttpResponse(status_code=304, headers=headers)
+    
+    return func.HttpResponse(
+        entry.value,
+        status_code=200,
+        headers=headers,
+        mimetype="application/json"
+    )
+
+@app.route(route="wcl_snapshot", methods=["GET"])
+def wcl_snapshot_http_trigger(req: func.HttpRequest) -> func.HttpResponse:
+    with wcl_metrics.invocation('wcl_snapshot'):
+        return serve_wcl_snapshot(req)
+
+@app.route(route="wcl_data_importer_http_trigger")
+def wcl_data_importer_http_trigger(req: func.HttpRequest) -> func.HttpResponse:
+    with wcl_metrics.invocation('wcl_import', mode=req.params.get('mode', 'page')):
+        return import_wcl_data(req)
+
+# The scheduled matrix runs on Durable Functions; its triggers (and the
+# aiohttp-heavy SDK behind them) only load when it is switched on
+if os.environ.get('WCL_DURABLE_ENABLED', 'false') == 'true':
+    import wcl_durable
+    app.register_functions(wcl_durable.bp)
@@ -0,0 +1,269 @@
+"""
+Daily compaction of small lake files into one Parquet file per partition
+
+Every page import leaves its own mythic_damage_stats/ snapshot, matrix runs
+leave one object per shard and Parquet imports one small file per run, so a
+day of scheduled runs is thousands of tiny objects. compact_day() merges one
+day's files into a single sorted, zstd-compressed file per zone=/metric=/date=
+partition, reads every written file back to check its row count and only
+then deletes the originals.
+
+Each compacted file lists the files it absorbed in its Parquet metadata, so
+a run interrupted between writing and deleting never counts their rows
+twice; the next run only finishes the deletes.
+
+    python lake_compaction.py [--date 2026-10-17] [--dry-run]
+"""
+
+import io
+import os
+import re
+import sys
+import json
+import gzip
+import time
+import logging
+import argparse
+from datetime import date, datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from azure.core.exceptions import ResourceNotFoundError
+import wcl_metrics
+import lake_sinks
+
+# Roots function_app writes run outputs to
+STATS_ROOT = "mythic_damage_stats"
+MATRIX_ROOT = "mythic_damage_matrix"
+
+COMPACTED_NAME = "mythic_damage_compacted.parquet"
+COMPACTION_COMPRESSION = os.environ.get('WCL_COMPACTION_COMPRESSION', 'zstd')
+COMPACTION_WORKERS = int(os.environ.get('WCL_COMPACTION_WORKERS', '16'))
+
+# Parquet key/value metadata listing the files a compacted file absorbed
+SOURCES_KEY = b'wcl_compacted_from'
+
+# Rows of one table stay together, in scrape order
+SORT_COLUMNS = ['boss', 'difficulty', 'partition', 'class', 'spec', 'scraped_at']
+# Table filters; Parquet files written before page imports were tagged lack them, so they are nullable once merged
+FILTER_COLUMNS = ('boss', 'difficulty', 'partition')
+
+OUTPUT_SUFFIX = r'(?:_[0-9a-f]{8})?'
+RECORD_EXTENSIONS = r'\.(?:json|ndjson|ndjson\.gz|ndjson\.zst)'
+PARTITION_PATTERN = re.compile(r'zone=([^/]+)/metric=([^/]+)/date=([^/]+)/')
+
+def day_patterns(day):
+    """Regexes matching the record files and Parquet files one day's runs leave behind"""
+    stamp = day.strftime('%Y%m%d')
+    # Outputs are stamped YYYYMMDD_HHMMSS_<suffix> (older ones without the suffix);
+    # scheduled matrix runs are named YYYYMMDDTHH
+    records = re.compile(
+        rf'(?:{STATS_ROOT}/mythic_damage_{stamp}_\d{{6}}{OUTPUT_SUFFIX}'
+        rf'|{MATRIX_ROOT}/run={stamp}(?:T\d{{2}}|_\d{{6}}{OUTPUT_SUFFIX})/[^/]+){RECORD_EXTENSIONS}'
+    )
+    parquet = re.compile(rf'{lake_sinks.PARQUET_ROOT}/zone=[^/]+/metric=[^/]+/date={day.isoformat()}/[^/]+\.parquet')
+    return records, parquet
+
+def compacted_path(zone, metric, day):
+    return f"{lake_sinks.PARQUET_ROOT}/zone={zone}/metric={metric}/date={day}/{COMPACTED_NAME}"
+
+def list_files(file_system_client, roots):
+    """{path: size} of every file under the given roots; missing roots are skipped"""
+    files = {}
+    for root in roots:
+        try:
+            for path in file_system_client.get_paths(path=root, recursive=True):
+                if not path.is_directory:
+                    files[path.name] = path.content_length
+        except ResourceNotFoundError:
+            continue
+    return files
+
+def read_records(path, payload):
+    """Records of a JSON array or (compressed) NDJSON file"""
+    if path.endswith('.gz'):
+        payload = gzip.decompress(payload)
+    elif path.endswith('.zst'):
+        import zstandard
+        # Streamed files don't record their size, so decompress incrementally
+        payload = zstandard.ZstdDecompressor().decompressobj().decompress(payload)
+
+    if path.endswith('.json'):
+        return json.loads(payload)
+    return [json.loads(line) for line in payload.splitlines() if line.strip()]
+
+def read_parquet(payload):
+    import pyarrow.parquet as pq
+    return pq.read_table(io.BytesIO(payload))
+
+def source_partitions(path, payload):
+    """Split one source file into {(zone, metric, date): frame without the partition columns}"""
+    if path.endswith('.parquet'):
+        frame = read_parquet(payload).to_pandas()
+        return {PARTITION_PATTERN.search(path).groups(): frame} if len(frame) else {}
+
+    records = read_records(path, payload)
+    if not records:
+        return {}
+    frame = lake_sinks.records_to_frame(records)
+    return {
+        (str(zone), metric, day): part.drop(columns=lake_sinks.PARQUET_PARTITION_COLUMNS)
+        for (zone, metric, day), part in frame.groupby(lake_sinks.PARQUET_PARTITION_COLUMNS, observed=True, sort=True)
+    }
+
+def merge_frames(frames):
+    """Concatenate partition frames into one frame sorted by table, class, spec and time"""
+    import pandas as pd
+
+    merged = pd.concat(frames, ignore_index=True)
+    for column in FILTER_COLUMNS:
+        if column in merged:
+            merged[column] = merged[column].astype('Int32')
+    # Categories differing between files fall back to object on concat; re-encode sorted
+    merged['class'] = merged['class'].astype(str).astype('category')
+    merged['spec'] = merged['spec'].astype(str).astype('category')
+
+    sort_columns = [column for column in SORT_COLUMNS if column in merged]
+    return merged.sort_values(sort_columns, kind='stable', na_position='first', ignore_index=True)
+
+def read_compacted(payload):
+    """(row count, absorbed file paths) of a compacted file; reads every row, not just the footer"""
+    table = read_parquet(payload)
+    sources = (table.schema.metadata or {}).get(SOURCES_KEY)
+    return table.num_rows, set(json.loads(sources)) if sources else set()
+
+def verify_compacted(path, payload, rows, sources):
+    found_rows, found_sources = read_compacted(payload)
+    if found_rows != rows or found_sources != set(sources):
+        raise ValueError(
+            f"Compacted file {path} holds {found_rows} rows from {len(found_sources)} files, "
+            f"expected {rows} rows from {len(sources)}"
+        )
+
+def compact_day(file_system_client, day=None, dry_run=False, workers=None):
+    """Merge one UTC day's small files (yesterday by default) into one Parquet file per partition
+
+    Originals are deleted only after every partition was written and read
+    back with the expected row count; a mismatch raises and leaves them in
+    place. With dry_run nothing is uploaded or deleted. Returns a summary.
+    """
+    started = time.perf_counter()
+    day = day or (datetime.now(timezone.utc) - timedelta(days=1)).date()
+    workers = workers or COMPACTION_WORKERS
+    metrics = wcl_metrics.current()
+
+    records_pattern, parquet_pattern = day_patterns(day)
+    listing = list_files(file_system_client, [STATS_ROOT, MATRIX_ROOT, lake_sinks.PARQUET_ROOT])
+    sources = sorted(
+        path for path in listing
+        if records_pattern.fullmatch(path)
+        or (parquet_pattern.fullmatch(path) and not path.endswith(f"/{COMPACTED_NAME}"))
+    )
+
+    summary = {
+        'date': day.isoformat(),
+        'dry_run': dry_run,
+        'files': len(sources),
+        'bytes_before': sum(listing[path] for path in sources),
+        'bytes_after': 0,
+        'rows': 0,
+        'partitions': {},
+        'deleted': 0
+    }
+    if not sources:
+        logging.info(f"Nothing to compact for {day.isoformat()}")
+        return summary
+
+    def download(path):
+        return file_system_client.get_file_client(path).download_file().readall()
+
+    def load(path):
+        try:
+            return path, source_partitions(path, download(path))
+        except (ValueError, ImportError) as e:
+            # Untagged (written before batches carried their table), unreadable, or a .zst file
+            # without zstandard installed (see requirements.txt); never guess a partition
+            logging.warning(f"Leaving {path} uncompacted: {str(e)}")
+            return path, None
+
+    # Thousands of small objects: the round-trips dominate, not the parsing
+    partitions = {}
+    skipped = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for path, parts in executor.map(load, sources):
+            if parts is None:
+                skipped.append(path)
+                continue
+            for key, frame in parts.items():
+                partitions.setdefault(key, []).append((path, frame))
+    sources = [path for path in sources if path not in skipped]
+    summary['skipped'] = skipped
+
+    for key, parts in sorted(partitions.items()):
+        target = compacted_path(*key)
+        frames = []
+        existing_rows, absorbed = 0, set()
+        if target in listing:
+            payload = download(target)
+            existing_rows, absorbed = read_compacted(payload)
+            frames.append(read_parquet(payload).to_pandas())
+
+        # Files an earlier run absorbed but didn't get to delete
+        new = [(path, frame) for path, frame in parts if path not in absorbed]
+        if not new:
+            continue
+        frames += [frame for _, frame in new]
+        rows = existing_rows + sum(len(frame) for _, frame in new)
+        # Only files that still exist need guarding against a second merge
+        absorbed = sorted({path for path in absorbed if path in listing} | {path for path, _ in new})
+
+        payload = lake_sinks.frame_to_parquet(
+            merge_frames(frames),
+            COMPACTION_COMPRESSION,
+            metadata={SOURCES_KEY: json.dumps(absorbed)}
+        )
+        verify_compacted(target, payload, rows, absorbed)
+        if not dry_run:
+            file_client = file_system_client.get_file_client(target)
+            file_client.upload_data(payload, overwrite=True)
+            verify_compacted(target, file_client.download_file().readall(), rows, absorbed)
+
+        summary['partitions'][target] = {'rows': rows, 'files': len(new), 'bytes': len(payload)}
+        summary['rows'] += rows - existing_rows
+        summary['bytes_after'] += len(payload)
+
+    if not dry_run:
+        def delete(path):
+            try:
+                file_system_client.get_file_client(path).delete_file()
+            except ResourceNotFoundError:
+                pass
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(delete, sources))
+        summary['deleted'] = len(sources)
+
+    summary['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    metrics.add('compaction_files', len(sources))
+    metrics.add('compaction_rows', summary['rows'])
+    metrics.add('compaction_ms', summary['elapsed_ms'])
+    logging.info(
+        f"Compacted {len(sources)} files ({summary['bytes_before']} bytes) for {day.isoformat()} into "
+        f"{len(summary['partitions'])} partitions ({summary['bytes_after']} bytes, {summary['rows']} rows)"
+    )
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact one day of small lake files into daily Parquet partitions")
+    parser.add_argument('--date', type=date.fromisoformat, help='UTC day to compact (default: yesterday)')
+    parser.add_argument('--container', default='warcraft-logs-data')
+    parser.add_argument('--dry-run', action='store_true', help="merge and verify, but don't upload or delete anything")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    # Same credentials and DATALAKE_LOCAL_ROOT handling as the Function app
+    from function_app import get_file_system_client
+
+    try:
+        print(json.dumps(compact_day(get_file_system_client(args.container), args.date, args.dry_run), indent=2))
+    except Exception as e:
+        print(f"Compaction failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,128 @@
+"""
+Serializers for writing scraped WCL records to the Data Lake
+
+Each sink turns a list of records into the bytes (and lake paths) to upload;
+function_app owns the storage clients and does the actual upload.
+"""
+
+import io
+import os
+import json
+import zlib
+from datetime import datetime, timezone
+
+PARQUET_ROOT = "mythic_damage_parquet"
+PARQUET_COMPRESSION = os.environ.get('WCL_PARQUET_COMPRESSION', 'snappy')
+
+# Columns that become directories rather than data in the Parquet files
+PARQUET_PARTITION_COLUMNS = ['zone', 'metric', 'date']
+
+NDJSON_COMPRESSION = os.environ.get('WCL_NDJSON_COMPRESSION', 'gzip')
+NDJSON_EXTENSIONS = {'gzip': '.ndjson.gz', 'zstd': '.ndjson.zst', 'none': '.ndjson'}
+
+# Size of each append_data call; the Data Lake caps a single append at 100 MiB
+APPEND_CHUNK_SIZE = int(os.environ.get('WCL_APPEND_CHUNK_SIZE', str(4 * 1024 * 1024)))
+
+def records_to_frame(data):
+    """Build a typed DataFrame from scraped records"""
+    # pandas/pyarrow are only loaded by the Parquet path, never by NDJSON uploads
+    import pandas as pd
+
+    # Record batches hand over their columns directly, without a dict per row
+    if hasattr(data, 'columns'):
+        df = pd.DataFrame(data.columns())
+    else:
+        df = pd.DataFrame.from_records(data)
+
+    # Every batch is tagged with its table; guessing one would file rows under the wrong partition
+    for column in ('zone', 'metric'):
+        if column not in df or df[column].isna().any():
+            raise ValueError(f"Records without a '{column}' tag can't be partitioned")
+
+    df['zone'] = df['zone'].astype('int32')
+    df['metric'] = df['metric'].astype(str)
+    df['score'] = df['score'].astype('float64')
+    df['parses'] = df['parses'].astype('int64')
+    df['scraped_at'] = pd.to_datetime(df['scraped_at'], utc=True)
+    df['date'] = df['scraped_at'].dt.strftime('%Y-%m-%d')
+
+    for column in ('boss', 'difficulty', 'partition'):
+        if column in df:
+            df[column] = df[column].astype('int32')
+
+    # Few distinct values repeated across every row; stored as dictionaries
+    df['class'] = df['class'].astype('category')
+    df['spec'] = df['spec'].astype('category')
+    return df
+
+def frame_to_parquet(df, compression=None, metadata=None):
+    """Serialize a DataFrame to Parquet bytes with dictionary-encoded class/spec"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if metadata:
+        # Extra file-level key/values next to the pandas schema
+        table = table.replace_schema_metadata({**table.schema.metadata, **metadata})
+
+    buffer = io.BytesIO()
+    pq.write_table(
+        table,
+        buffer,
+        compression=compression or PARQUET_COMPRESSION,
+        use_dictionary=['class', 'spec']
+    )
+    return buffer.getvalue()
+
+def build_parquet_partitions(data, run_timestamp=None, compression=None):
+    """Split records into zone=/metric=/date= partitions; returns {lake path: parquet bytes}"""
+    if run_timestamp is None:
+        run_timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+
+    df = records_to_frame(data)
+    files = {}
+
+    for (zone, metric, date), part in df.groupby(PARQUET_PARTITION_COLUMNS, observed=True, sort=True):
+        path = f"{PARQUET_ROOT}/zone={zone}/metric={metric}/date={date}/mythic_damage_{run_timestamp}.parquet"
+        files[path] = frame_to_parquet(part.drop(columns=PARQUET_PARTITION_COLUMNS), compression)
+
+    return files
+
+class _Passthrough:
+    """Compressor stand-in for uncompressed output"""
+
+    def compress(self, data):
+        return data
+
+    def flush(self):
+        return b''
+
+def get_compressor(compression):
+    """Return a streaming compressor with compress()/flush() for gzip, zstd or none"""
+    if compression == 'gzip':
+        # wbits=31 writes a gzip header so the file opens with standard tools
+        return zlib.compressobj(6, zlib.DEFLATED, 31)
+    if compression == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    if compression == 'none':
+        return _Passthrough()
+    raise ValueError(f"Unsupported NDJSON compression: {compression}")
+
+def iter_ndjson_chunks(records, compression=None, chunk_size=None):
+    """Yield compressed NDJSON in roughly chunk_size pieces without holding the whole file"""
+    compressor = get_compressor(compression or NDJSON_COMPRESSION)
+    chunk_size = chunk_size or APPEND_CHUNK_SIZE
+    pending = bytearray()
+
+    for record in records:
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        pending += compressor.compress(line.encode('utf-8'))
+
+        if len(pending) >= chunk_size:
+            yield bytes(pending)
+            pending.clear()
+
+    pending += compressor.flush()
+    if pending:
+        yield bytes(pending)
@@ -0,0 +1,265 @@
+"""
+Filesystem-backed stand-in for the Azure Data Lake clients
+
+Implements the part of DataLakeServiceClient / FileSystemClient /
+DataLakeFileClient that function_app uses, on top of a local directory.
+Each call can be given a fixed latency (plus a bandwidth cap), and every
+call and byte is counted, so upload strategies can be benchmarked offline.
+
+Set DATALAKE_LOCAL_ROOT to a directory to make function_app use it instead
+of Azure.
+"""
+
+import os
+import time
+import uuid
+import shutil
+import threading
+from datetime import datetime, timezone
+from azure.core import MatchConditions
+from azure.core.exceptions import HttpResponseError, ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+
+class LakeStats:
+    """Thread-safe call and byte counters shared by every client of one service"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls = {}
+            self.bytes_uploaded = 0
+            self.bytes_downloaded = 0
+            self.busy_seconds = 0.0
+            self.started = time.perf_counter()
+
+    def record(self, method, uploaded=0, downloaded=0, seconds=0.0):
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            self.bytes_uploaded += uploaded
+            self.bytes_downloaded += downloaded
+            self.busy_seconds += seconds
+
+    def snapshot(self):
+        """Counters plus throughput since the last reset"""
+        with self._lock:
+            elapsed = time.perf_counter() - self.started
+            return {
+                'calls': dict(self.calls),
+                'total_calls': sum(self.calls.values()),
+                'bytes_uploaded': self.bytes_uploaded,
+                'bytes_downloaded': self.bytes_downloaded,
+                'elapsed_seconds': round(elapsed, 4),
+                'upload_mb_per_sec': round(self.bytes_uploaded / elapsed / (1024 * 1024), 3) if elapsed else None,
+                'calls_per_sec': round(sum(self.calls.values()) / elapsed, 1) if elapsed else None
+            }
+
+def _as_bytes(data):
+    if isinstance(data, str):
+        return data.encode('utf-8')
+    if hasattr(data, 'read'):
+        return data.read()
+    return bytes(data)
+
+class LocalFileProperties:
+    """Minimal FileProperties, as found on download_file().properties"""
+
+    def __init__(self, name, size, last_modified):
+        self.name = name
+        self.size = size
+        self.last_modified = last_modified
+
+class LocalDownloader:
+    """Minimal StorageStreamDownloader"""
+
+    def __init__(self, content, properties=None):
+        self._content = content
+        self.properties = properties
+
+    def readall(self):
+        return self._content
+
+class LocalFileClient:
+    """DataLakeFileClient backed by one local file"""
+
+    def __init__(self, file_system, path):
+        self.file_system = file_system
+        self.path_name = path
+        self._local_path = os.path.join(file_system.local_root, *path.split('/'))
+        self._staged = bytearray()
+
+    def _call(self, method, uploaded=0, downloaded=0):
+        self.file_system.service.simulate(method, uploaded, downloaded)
+
+    def exists(self):
+        self._call('exists')
+        return os.path.isfile(self._local_path)
+
+    def create_file(self):
+        self._call('create_file')
+        os.makedirs(os.path.dirname(self._local_path), exist_ok=True)
+        with open(self._local_path, 'wb'):
+            pass
+        self._staged = bytearray()
+
+    def upload_data(self, data, overwrite=False, length=None, match_condition=None, **kwargs):
+        payload = _as_bytes(data)
+        if length is not None:
+            payload = payload[:length]
+        self._call('upload_data', uploaded=len(payload))
+
+        # Same as the SDK: without overwrite nothing creates the path, the data is only
+        # appended and flushed with If-None-Match: *, so it fails whether or not the path exists
+        if not overwrite:
+            if not os.path.exists(self._local_path):
+                raise ResourceNotFoundError(f"The specified path does not exist: {self.path_name}")
+            raise ResourceModifiedError(f"ConditionNotMet: {self.path_name}")
+        if match_condition not in (None, MatchConditions.IfMissing):
+            raise ValueError(f"Unsupported match_condition: {match_condition}")
+
+        os.makedirs(os.path.dirname(self._local_path), exist_ok=True)
+        if match_condition == MatchConditions.IfMissing:
+            # Create the (empty) path atomically, as the conditional create does, then write it
+            try:
+                os.close(os.open(self._local_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            except FileExistsError:
+                raise ResourceExistsError(f"The specified path already exists: {self.path_name}")
+        # Write then rename so readers never see a half-written file; one temp file per call
+        # so concurrent writers of a path don't replace each other's
+        temp_path = f"{self._local_path}.{uuid.uuid4().hex}.uploading"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(temp_path, self._local_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def append_data(self, data, offset, length=None, **kwargs):
+        payload = _as_bytes(data)
+        if length is not None:
+            payload = payload[:length]
+        self._call('append_data', uploaded=len(payload))
+
+        committed = os.path.getsize(self._local_path) if os.path.exists(self._local_path) else None
+        if committed is None:
+            raise ResourceNotFoundError(f"The specified path does not exist: {self.path_name}")
+        if offset != committed + len(self._staged):
+            raise HttpResponseError(message=f"InvalidAppendOffset: expected {committed + len(self._staged)}, got {offset}")
+        self._staged += payload
+
+    def flush_data(self, offset, **kwargs):
+        self._call('flush_data')
+
+        committed = os.path.getsize(self._local_path)
+        if offset != committed + len(self._staged):
+            raise HttpResponseError(message=f"InvalidFlushPosition: expected {committed + len(self._staged)}, got {offset}")
+        with open(self._local_path, 'ab') as f:
+            f.write(self._staged)
+        self._staged = bytearray()
+
+    def download_file(self, **kwargs):
+        if not os.path.isfile(self._local_path):
+            self._call('download_file')
+            raise ResourceNotFoundError(f"The specified path does not exist: {self.path_name}")
+        with open(self._local_path, 'rb') as f:
+            content = f.read()
+        self._call('download_file', downloaded=len(content))
+        modified = datetime.fromtimestamp(os.path.getmtime(self._local_path), timezone.utc)
+        return LocalDownloader(content, LocalFileProperties(self.path_name, len(content), modified))
+
+    def delete_file(self, **kwargs):
+        self._call('delete_file')
+        if not os.path.isfile(self._local_path):
+            raise ResourceNotFoundError(f"The specified path does not exist: {self.path_name}")
+        os.remove(self._local_path)
+
+class LocalPathProperties:
+    """Minimal PathProperties as yielded by get_paths"""
+
+    def __init__(self, name, is_directory, content_length, last_modified):
+        self.name = name
+        self.is_directory = is_directory
+        self.content_length = content_length
+        self.last_modified = last_modified
+
+class LocalFileSystemClient:
+    """FileSystemClient backed by one directory per container"""
+
+    def __init__(self, service, file_system_name):
+        self.service = service
+        self.file_system_name = file_system_name
+        self.local_root = os.path.join(service.root, file_system_name)
+
+    def exists(self):
+        self.service.simulate('exists')
+        return os.path.isdir(self.local_root)
+
+    def create_file_system(self, **kwargs):
+        self.service.simulate('create_file_system')
+        if os.path.isdir(self.local_root):
+            raise ResourceExistsError("ContainerAlreadyExists")
+        os.makedirs(self.local_root)
+
+    def delete_file_system(self, **kwargs):
+        self.service.simulate('delete_file_system')
+        shutil.rmtree(self.local_root, ignore_errors=True)
+
+    def get_paths(self, path=None, recursive=True, **kwargs):
+        """List files and directories under path, like FileSystemClient.get_paths"""
+        self.service.simulate('get_paths')
+        start = os.path.join(self.local_root, *path.strip('/').split('/')) if path else self.local_root
+        if not os.path.isdir(start):
+            raise ResourceNotFoundError(f"The specified path does not exist: {path}")
+
+        for directory, subdirectories, files in os.walk(start):
+            subdirectories.sort()
+            entries = [(name, True) for name in subdirectories]
+            # Skip uploads that are still being written
+            entries += [(name, False) for name in sorted(files) if not name.endswith('.uploading')]
+            for name, is_directory in entries:
+                local_path = os.path.join(directory, name)
+                stat = os.stat(local_path)
+                yield LocalPathProperties(
+                    os.path.relpath(local_path, self.local_root).replace(os.sep, '/'),
+                    is_directory,
+                    0 if is_directory else stat.st_size,
+                    datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+                )
+            if not recursive:
+                break
+
+    def get_file_client(self, file_path):
+        return LocalFileClient(self, file_path)
+
+class LocalDataLakeServiceClient:
+    """DataLakeServiceClient stand-in rooted at a local directory"""
+
+    def __init__(self, root, latency_ms=0.0, bandwidth_mb_per_sec=None):
+        self.root = root
+        self.latency_ms = latency_ms
+        self.bandwidth_mb_per_sec = bandwidth_mb_per_sec
+        self.stats = LakeStats()
+        os.makedirs(root, exist_ok=True)
+
+    def simulate(self, method, uploaded=0, downloaded=0):
+        """Sleep for the configured round-trip and transfer time, then count the call"""
+        seconds = self.latency_ms / 1000
+        if self.bandwidth_mb_per_sec:
+            seconds += (uploaded + downloaded) / (self.bandwidth_mb_per_sec * 1024 * 1024)
+        if seconds:
+            time.sleep(seconds)
+        self.stats.record(method, uploaded, downloaded, seconds)
+
+    def get_file_system_client(self, file_system):
+        return LocalFileSystemClient(self, file_system)
+
+def from_environment():
+    """Build a local lake from DATALAKE_LOCAL_* settings"""
+    return LocalDataLakeServiceClient(
+        os.environ['DATALAKE_LOCAL_ROOT'],
+        latency_ms=float(os.environ.get('DATALAKE_LOCAL_LATENCY_MS', '0')),
+        bandwidth_mb_per_sec=float(os.environ['DATALAKE_LOCAL_BANDWIDTH_MBPS']) if os.environ.get('DATALAKE_LOCAL_BANDWIDTH_MBPS') else None
+    )
@@ -0,0 +1,74 @@
+"""
+In-process stand-in for the Durable Functions orchestrator
+
+Runs an orchestrator generator the way the Durable runtime would: every
+yielded call_activity() is executed, task_all() batches run concurrently,
+and inputs/outputs go through JSON just like durable history does. Lets the
+matrix orchestration run locally without the Functions host or a task hub.
+"""
+
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+class LocalActivityTask:
+    """A scheduled activity call, executed when the orchestrator yields it"""
+
+    def __init__(self, name, payload):
+        self.name = name
+        self.payload = payload
+
+class LocalOrchestrationContext:
+    """Subset of DurableOrchestrationContext used by our orchestrators"""
+
+    def __init__(self, orchestration_input=None, instance_id='local'):
+        self._input = orchestration_input
+        self.instance_id = instance_id
+        self.is_replaying = False
+        self.custom_status = None
+
+    @property
+    def current_utc_datetime(self):
+        return datetime.now(timezone.utc)
+
+    def get_input(self):
+        return self._input
+
+    def call_activity(self, name, input_=None):
+        return LocalActivityTask(name, input_)
+
+    def task_all(self, activities):
+        return list(activities)
+
+    def set_custom_status(self, status):
+        self.custom_status = status
+        logging.info(f"Orchestration {self.instance_id} status: {status}")
+
+def _round_trip(value):
+    """Serialize like durable history so non-JSON payloads fail locally too"""
+    return json.loads(json.dumps(value))
+
+def run_orchestration(orchestrator, activities, orchestration_input=None, max_concurrency=8, instance_id='local'):
+    """Drive an orchestrator generator to completion and return its result"""
+    context = LocalOrchestrationContext(_round_trip(orchestration_input), instance_id)
+
+    def run_activity(task):
+        if task.name not in activities:
+            raise ValueError(f"Unknown activity: {task.name}")
+        return _round_trip(activities[task.name](_round_trip(task.payload)))
+
+    steps = orchestrator(context)
+    result = None
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        try:
+            step = next(steps)
+            while True:
+                if isinstance(step, list):
+                    result = list(executor.map(run_activity, step))
+                else:
+                    result = run_activity(step)
+                step = steps.send(result)
+        except StopIteration as stop:
+            return stop.value
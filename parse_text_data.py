@@ -1,11 +1,27 @@
 #!/usr/bin/env python3
 """
 Parse the WCL data from the webpage content we retrieved earlier
+
+Also ingests archived text dumps of the same page of any size:
+
+    python parse_text_data.py dump1.txt dump2.txt.gz --output parsed.json
+
+The dump is tokenized in one pass over the file, with class and spec
+names (including "Demon Hunter", "Beast Mastery", ...) recognized by a
+prefix trie, and records are yielded as they complete, so memory stays
+flat however large the input is.
 """
 
-from datetime import datetime
+import io
 import re
+import sys
+import gzip
 import json
+import codecs
+import argparse
+from datetime import datetime, timezone
+# Fixed class/spec vocabulary the tokenizer recognizes
+from wcl_records import CLASS_SPECS
 
 # This is the data from the webpage I fetched earlier
 webpage_content = """
@@ -168,73 +184,167 @@ Priest![Image](https://assets.rpglogs.com/img/warcraft/icons/actors.jpg?v=27)
 Holy3.0825.0524,095
 """
 
-def parse_wcl_text_data():
-    """Parse the damage data from the text content"""
-    data = []
-    
-    # Remove the image references
-    cleaned_content = re.sub(r'!\[Image\]\([^)]+\)', '', webpage_content)
-    
-    # Split by classes, each class starts with the class name followed by specs
-    # Pattern: Class followed by Spec followed by numbers
-    pattern = r'([A-Za-z\s]+?)([A-Za-z\s]+?)(\d+\.\d+)(\d+\.\d+)([\d,]+)'
-    
-    lines = cleaned_content.strip().split('\n\n')
-    
-    current_class = None
-    for line in lines:
-        line = line.strip()
-        if not line or 'Class Spec Score Max Parses' in line:
+# Score and max always carry two decimals, so "81.2196.602,191" splits as 81.21 / 96.60 / 2,191
+NUMBERS = re.compile(r'(\d+\.\d\d)(\d+\.\d\d)(\d[\d,]*)')
+IMAGE = re.compile(r'!\[[^\]]*\]\([^)]*\)')
+SPACE = re.compile(r'\s+')
+OTHER = re.compile(r'[^\s!\d]+')
+
+# Lookahead kept in the buffer so no token is ever split across reads
+MAX_TOKEN = 1024
+
+class NameTrie:
+    """Prefix trie over a fixed vocabulary of (kind, name) entries"""
+
+    _END = None
+
+    def __init__(self, entries):
+        self.root = {}
+        for kind, name in entries:
+            node = self.root
+            for char in name:
+                node = node.setdefault(char, {})
+            node[self._END] = (kind, name)
+
+    def match(self, text, pos):
+        """Longest entry starting at text[pos] that ends on a word boundary, with its end; else (None, pos)"""
+        node = self.root
+        found, end = None, pos
+        index = pos
+        while index < len(text):
+            node = node.get(text[index])
+            if node is None:
+                break
+            index += 1
+            if self._END in node and (index == len(text) or not text[index].isalpha()):
+                found, end = node[self._END], index
+        return found, end
+
+VOCABULARY = NameTrie(
+    [('class', name) for name in CLASS_SPECS] +
+    [('spec', spec) for spec in set().union(*CLASS_SPECS.values())]
+)
+
+def iter_tokens(stream, chunk_size=65536):
+    """Yield (kind, value) tokens from a text dump in a single pass over `stream`
+
+    Kinds are 'class', 'spec' and 'numbers' ((score, max, parses) text).
+    Image links, whitespace, the header and unknown words are skipped.
+    `stream` may be a text or binary (UTF-8) file object.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    buffer = ''
+    pos = 0
+    eof = False
+
+    while True:
+        if not eof and len(buffer) - pos < MAX_TOKEN:
+            chunk = stream.read(chunk_size)
+            if isinstance(chunk, bytes):
+                chunk = decoder.decode(chunk, final=not chunk)
+            if chunk:
+                buffer = buffer[pos:] + chunk
+                pos = 0
+            else:
+                eof = True
             continue
-            
-        # Try to extract class/spec/numbers from each line
-        # Split the line to see if we can identify the components
-        parts = line.split()
-        
-        if len(parts) >= 4:
-            # Try to identify if this is a new class or a spec
-            potential_class = parts[0]
-            potential_spec = parts[1] if len(parts) > 1 else ""
-            
-            # Look for numbers in the line
-            numbers = re.findall(r'[\d,]+\.?\d*', line)
-            
-            if len(numbers) >= 3:  # We need at least score, max, and parses
-                try:
-                    score = float(numbers[0].replace(',', ''))
-                    # Skip max (numbers[1])
-                    parses = int(numbers[2].replace(',', ''))
-                    
-                    # If we have a valid class name pattern
-                    if potential_class and potential_spec:
-                        current_class = potential_class
-                        
-                        entry = {
-                            'class': current_class,
-                            'spec': potential_spec,
-                            'score': score,
-                            'parses': parses,
-                            'scraped_at': datetime.utcnow().isoformat()
-                        }
-                        
-                        data.append(entry)
-                        print(f"Parsed: {entry}")
-                        
-                except (ValueError, IndexError) as e:
-                    print(f"Could not parse line: {line} - {e}")
-    
-    return data
+
+        if pos >= len(buffer):
+            return
+
+        char = buffer[pos]
+        if char.isspace():
+            pos = SPACE.match(buffer, pos).end()
+        elif char == '!':
+            image = IMAGE.match(buffer, pos)
+            pos = image.end() if image else pos + 1
+        elif char.isdigit():
+            numbers = NUMBERS.match(buffer, pos)
+            if numbers:
+                yield 'numbers', numbers.groups()
+                pos = numbers.end()
+            else:
+                pos += 1
+        else:
+            entry, end = VOCABULARY.match(buffer, pos)
+            if entry:
+                yield entry
+                pos = end
+            else:
+                other = OTHER.match(buffer, pos)
+                pos = other.end() if other else pos + 1
+
+def iter_text_cells(stream, chunk_size=65536):
+    """Yield raw (class, spec, score, parses) text per class/spec/numbers sequence in the dump"""
+    current_class = None
+    spec = None
+    for kind, value in iter_tokens(stream, chunk_size):
+        if kind == 'class':
+            current_class, spec = value, None
+        elif kind == 'spec':
+            # A spec is only meaningful under a class that has it
+            spec = value if value in CLASS_SPECS.get(current_class, ()) else None
+        elif spec:
+            score, _max, parses = value
+            yield current_class, spec, score, parses
+            spec = None
+
+def iter_text_records(stream, scraped_at=None, chunk_size=65536):
+    """Yield one record per class/spec/numbers sequence in the dump, as soon as it is complete"""
+    if scraped_at is None:
+        scraped_at = datetime.now(timezone.utc).isoformat()
+
+    for class_name, spec, score, parses in iter_text_cells(stream, chunk_size):
+        yield {
+            'class': class_name,
+            'spec': spec,
+            'score': float(score),
+            'parses': int(parses.replace(',', '')),
+            'scraped_at': scraped_at
+        }
+
+def open_dump(path):
+    """Open a text dump for streaming, transparently un-gzipping .gz archives"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+    return open(path, 'r', encoding='utf-8', errors='replace')
+
+def parse_wcl_text_data(content=webpage_content):
+    """Parse the damage data from the text content"""
+    return list(iter_text_records(io.StringIO(content)))
+
+def write_json_array(records, f):
+    """Write records as a JSON array one element at a time; returns the count"""
+    count = 0
+    f.write('[')
+    for record in records:
+        f.write(',\n  ' if count else '\n  ')
+        f.write(json.dumps(record))
+        count += 1
+    f.write('\n]\n' if count else ']\n')
+    return count
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parse WCL text dumps into records")
+    parser.add_argument('paths', nargs='*', help='text dumps (.txt or .gz); defaults to the embedded sample')
+    parser.add_argument('--output', default='parsed_wcl_data.json')
+    args = parser.parse_args()
+
+    def records():
+        if not args.paths:
+            yield from iter_text_records(io.StringIO(webpage_content))
+        for path in args.paths:
+            with open_dump(path) as f:
+                yield from iter_text_records(f)
+
     try:
-        data = parse_wcl_text_data()
-        print(f"\nSuccessfully parsed {len(data)} records")
-        
         # Save to file for inspection
-        with open('parsed_wcl_data.json', 'w') as f:
-            json.dump(data, f, indent=2)
-        
-        print("Data saved to parsed_wcl_data.json")
-        
+        with open(args.output, 'w') as f:
+            count = write_json_array(records(), f)
+
+        print(f"\nSuccessfully parsed {count} records")
+        print(f"Data saved to {args.output}")
+
     except Exception as e:
         print(f"Parsing failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Local replay server for Warcraft Logs pages and table fragments
+
+Serves the recorded full_page.html for /zone/statistics/<zone> and
+table_fragment.html for every /zone/statistics/table/... request, with
+injectable latency, 429 rate limiting, truncated bodies and slow drip
+responses. Point the scraper at it with WCL_BASE_URL:
+
+    python replay_server.py --port 8765 --latency-ms 80 --error-rate 0.05
+    WCL_BASE_URL=http://127.0.0.1:8765 python test_scraper.py
+
+Or load-test the concurrent matrix scrape in one go:
+
+    python replay_server.py --load-test 500 --concurrency 32 --latency-ms 100
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+FIXTURE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_FAULTS = {
+    'latency_ms': 0,        # added before every response
+    'jitter_ms': 0,         # uniform random extra latency
+    'error_rate': 0.0,      # share of requests answered with 429
+    'retry_after': 1,       # Retry-After seconds sent with a 429
+    'truncate_rate': 0.0,   # share of bodies cut off halfway (connection closed)
+    'drip_rate': 0.0,       # share of bodies sent in small delayed pieces
+    'drip_chunk': 1024,     # bytes per drip write
+    'drip_delay_ms': 50,    # pause between drip writes
+    'gzip': True            # honour Accept-Encoding: gzip like the real site
+}
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    """Answers WCL statistics URLs from recorded fixtures"""
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out as separate writes; don't let Nagle stall the body
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _count(self, key):
+        with self.server.stats_lock:
+            self.server.stats[key] = self.server.stats.get(key, 0) + 1
+
+    def _send(self, status, body, content_type='text/html; charset=utf-8', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        faults = self.server.faults
+        path = self.path.split('?', 1)[0]
+
+        if path == '/__stats':
+            with self.server.stats_lock:
+                body = json.dumps(self.server.stats).encode('utf-8')
+            self._send(200, body, 'application/json')
+            return
+
+        self._count('requests')
+        delay = faults['latency_ms'] + random.uniform(0, faults['jitter_ms'])
+        if delay:
+            time.sleep(delay / 1000)
+
+        if path.startswith('/zone/statistics/table/'):
+            body = self.server.fragment
+        elif path.startswith('/zone/statistics/'):
+            body = self.server.page
+        else:
+            self._count('not_found')
+            self._send(404, b'Not Found', 'text/plain')
+            return
+
+        if random.random() < faults['error_rate']:
+            self._count('rate_limited')
+            self._send(429, b'Too Many Requests', 'text/plain', {'Retry-After': str(faults['retry_after'])})
+            return
+
+        etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self._count('not_modified')
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        headers = {'ETag': etag}
+        if faults['gzip'] and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, compresslevel=5)
+            headers['Content-Encoding'] = 'gzip'
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        if random.random() < faults['truncate_rate']:
+            # Promise the full length, send half, hang up
+            self._count('truncated')
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+
+        if random.random() < faults['drip_rate']:
+            self._count('dripped')
+            for start in range(0, len(body), faults['drip_chunk']):
+                self.wfile.write(body[start:start + faults['drip_chunk']])
+                self.wfile.flush()
+                time.sleep(faults['drip_delay_ms'] / 1000)
+            return
+
+        self._count('ok')
+        self.wfile.write(body)
+
+def _read_fixture(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def start_replay_server(host='127.0.0.1', port=0, fragment=None, page=None, verbose=False, **faults):
+    """Start the replay server on a background thread; returns the server (call shutdown() when done)"""
+    unknown = set(faults) - set(DEFAULT_FAULTS)
+    if unknown:
+        raise ValueError(f"Unknown fault settings: {', '.join(sorted(unknown))}")
+
+    server = ThreadingHTTPServer((host, port), ReplayHandler)
+    server.daemon_threads = True
+    server.faults = {**DEFAULT_FAULTS, **faults}
+    server.fragment = _read_fixture(fragment or os.path.join(FIXTURE_DIR, 'table_fragment.html'))
+    server.page = _read_fixture(page or os.path.join(FIXTURE_DIR, 'full_page.html'))
+    server.verbose = verbose
+    server.stats = {}
+    server.stats_lock = threading.Lock()
+    server.base_url = f"http://{host}:{server.server_address[1]}"
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def run_load_test(server, shards, concurrency, rate_limit=0):
+    """Run the concurrent matrix scrape against the replay server and report throughput"""
+    # Both are read at import time, so set them before function_app loads
+    os.environ['WCL_BASE_URL'] = server.base_url
+    os.environ.setdefault('WCL_HTTP_POOL_SIZE', str(concurrency))
+    import function_app
+    import wcl_ratelimit
+
+    # Fresh limiter per run; rate_limit=0 leaves only the adaptive concurrency and retries
+    wcl_ratelimit.reset_rate_limiter(wcl_ratelimit.RateLimiter(
+        rate=rate_limit,
+        burst=max(1, int(rate_limit)),
+        initial_concurrency=concurrency,
+        max_concurrency=concurrency
+    ))
+
+    matrix = function_app.build_scrape_matrix(bosses=list(range(shards)))
+    start = time.perf_counter()
+    data, failures = function_app.scrape_wcl_matrix(matrix, max_concurrency=concurrency)
+    elapsed = time.perf_counter() - start
+
+    print(f"Shards: {len(matrix)}  concurrency: {concurrency}")
+    print(f"Elapsed: {elapsed:.2f}s  ({len(matrix) / elapsed:.1f} shards/s, {len(data) / elapsed:.0f} rows/s)")
+    print(f"Rows: {len(data)}  failed shards: {len(failures)}")
+    print(f"Server stats: {server.stats}")
+    print(f"Rate limiter: {wcl_ratelimit.get_rate_limiter().snapshot()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded Warcraft Logs responses locally")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--fragment', help='table fragment fixture (default table_fragment.html)')
+    parser.add_argument('--page', help='full page fixture (default full_page.html)')
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with 429')
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--truncate-rate', type=float, default=0.0)
+    parser.add_argument('--drip-rate', type=float, default=0.0)
+    parser.add_argument('--drip-chunk', type=int, default=1024)
+    parser.add_argument('--drip-delay-ms', type=float, default=50)
+    parser.add_argument('--no-gzip', action='store_true')
+    parser.add_argument('--seed', type=int, help='seed fault injection for repeatable runs')
+    parser.add_argument('--verbose', action='store_true')
+    parser.add_argument('--load-test', type=int, metavar='SHARDS', help='scrape this many shards against the server, then exit')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--rate-limit', type=float, default=0, help='client requests/sec during --load-test (0 = unlimited)')
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    server = start_replay_server(
+        args.host,
+        0 if args.load_test else args.port,
+        fragment=args.fragment,
+        page=args.page,
+        verbose=args.verbose,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        retry_after=args.retry_after,
+        truncate_rate=args.truncate_rate,
+        drip_rate=args.drip_rate,
+        drip_chunk=args.drip_chunk,
+        drip_delay_ms=args.drip_delay_ms,
+        gzip=not args.no_gzip
+    )
+
+    if args.load_test:
+        run_load_test(server, args.load_test, args.concurrency, args.rate_limit)
+        server.shutdown()
+        sys.exit(0)
+
+    print(f"Replaying WCL fixtures on {server.base_url} (stats at {server.base_url}/__stats)")
+    print(f"Run scrapers with WCL_BASE_URL={server.base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Import-time profile of the Function app's cold start
+
+Imports function_app in fresh interpreters under `python -X importtime`,
+then reports the total, the slowest modules and the cost per top-level
+package, and flags heavy dependencies that should only load on first use.
+
+    python startup_profile.py --runs 5 --top 25
+    python startup_profile.py --deferred --output startup.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Only needed by particular code paths; none of these should load with function_app
+DEFERRED_MODULES = ['requests', 'bs4', 'lxml.html', 'pandas', 'pyarrow', 'azure.storage.filedatalake', 'azure.durable_functions']
+
+def profile_import(module, extra=''):
+    """Import `module` in a fresh interpreter; returns [(name, depth, self_us, cumulative_us)]"""
+    code = f"import {module}\n{extra}" if extra else f"import {module}"
+    env = {**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=APP_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip(' '))) // 2
+        entries.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return entries
+
+def summarize(runs, top=20):
+    """Median timings across runs for the root import, slowest modules and packages"""
+    cumulative = {}
+    packages = {}
+    totals = []
+    loaded = set()
+
+    for entries in runs:
+        package_totals = {}
+        for name, depth, self_us, cumulative_us in entries:
+            cumulative.setdefault(name, []).append(cumulative_us)
+            root = name.split('.')[0]
+            package_totals[root] = package_totals.get(root, 0) + self_us
+            loaded.add(name)
+        for root, total in package_totals.items():
+            packages.setdefault(root, []).append(total)
+        # The root import is the last line and the only one at depth 0 we asked for
+        totals.append(entries[-1][3])
+
+    def median_ms(samples):
+        return round(statistics.median(samples) / 1000, 2)
+
+    slowest = sorted(cumulative.items(), key=lambda item: statistics.median(item[1]), reverse=True)[:top]
+    heaviest = sorted(packages.items(), key=lambda item: statistics.median(item[1]), reverse=True)[:top]
+
+    return {
+        'runs': len(runs),
+        'total_ms': median_ms(totals),
+        'modules_loaded': len(loaded),
+        'slowest_modules_ms': {name: median_ms(samples) for name, samples in slowest},
+        'packages_self_ms': {name: median_ms(samples) for name, samples in heaviest},
+        'deferred_but_loaded': [module for module in DEFERRED_MODULES if module in loaded]
+    }
+
+def profile_deferred(app_module, modules=None):
+    """What the first invocation pays for each deferred dependency once the app is loaded"""
+    costs = {}
+    for module in modules or DEFERRED_MODULES:
+        try:
+            entries = profile_import(app_module, f"import {module}")
+        except RuntimeError:
+            costs[module] = None
+            continue
+        target = [entry for entry in entries if entry[0] == module and entry[1] == 0]
+        costs[module] = round(target[-1][3] / 1000, 2) if target else 0.0
+    return costs
+
+def print_report(report):
+    print(f"Cold import of {report['module']}: {report['total_ms']} ms (median of {report['runs']} runs, {report['modules_loaded']} modules)")
+    print("\nSlowest modules (cumulative ms):")
+    for name, ms in report['slowest_modules_ms'].items():
+        print(f"  {ms:>9.2f}  {name}")
+    print("\nTop-level packages (self ms):")
+    for name, ms in report['packages_self_ms'].items():
+        print(f"  {ms:>9.2f}  {name}")
+    if report['deferred_but_loaded']:
+        print(f"\nLoaded at startup but expected to be lazy: {', '.join(report['deferred_but_loaded'])}")
+    else:
+        print("\nNo deferred dependencies loaded at startup")
+    if report.get('deferred_first_use_ms'):
+        print("\nFirst-use cost of deferred dependencies (ms):")
+        for name, ms in report['deferred_first_use_ms'].items():
+            print(f"  {ms if ms is not None else 'n/a':>9}  {name}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile import time of the Function app")
+    parser.add_argument('--module', default='function_app')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--deferred', action='store_true', help='also time each lazily imported dependency on first use')
+    parser.add_argument('--output', help='write the report as JSON')
+    args = parser.parse_args()
+
+    report = {'module': args.module, **summarize([profile_import(args.module) for _ in range(args.runs)], args.top)}
+    if args.deferred:
+        report['deferred_first_use_ms'] = profile_deferred(args.module)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport saved to {args.output}")
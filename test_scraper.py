@@ -3,7 +3,8 @@
 Test script to verify the WCL scraping functionality
 """
 
-import requests
+import wcl_http
+from wcl_http import WCL_BASE_URL
 from bs4 import BeautifulSoup
 import json
 from datetime import datetime
@@ -11,15 +12,11 @@ import re
 
 def scrape_wcl_damage_data():
     """Scrape damage statistics from Warcraft Logs"""
-    url = "https://www.warcraftlogs.com/zone/statistics/42?class=Any"
+    url = f"{WCL_BASE_URL}/zone/statistics/42?class=Any"
     
     try:
-        # Make request with proper headers to avoid blocking
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
         print(f"Fetching data from: {url}")
-        response = requests.get(url, headers=headers, timeout=30)
+        response = wcl_http.get(url)
         response.raise_for_status()
         
         # Parse HTML
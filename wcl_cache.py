@@ -0,0 +1,153 @@
+"""
+Process-level TTL cache for the latest parsed snapshots
+
+Entries are fresh for WCL_CACHE_TTL seconds. For WCL_CACHE_STALE seconds
+after that they are still served while a single background refresh
+replaces them (stale-while-revalidate); past that a request waits for the
+reload, and concurrent requests for the same key wait on the same one.
+If a reload fails the previous entry keeps being served.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+WCL_CACHE_TTL = float(os.environ.get('WCL_CACHE_TTL', '60'))
+WCL_CACHE_STALE = float(os.environ.get('WCL_CACHE_STALE', '300'))
+WCL_CACHE_MAX_ENTRIES = int(os.environ.get('WCL_CACHE_MAX_ENTRIES', '32'))
+
+class CacheEntry:
+    """A cached value with its validator and when it was stored"""
+
+    __slots__ = ('value', 'etag', 'stored_at', '_stored')
+
+    def __init__(self, value, etag):
+        self.value = value
+        self.etag = etag
+        self.stored_at = datetime.now(timezone.utc).isoformat()
+        self._stored = time.monotonic()
+
+    def age(self):
+        return time.monotonic() - self._stored
+
+class SnapshotCache:
+    """LRU of CacheEntry by key with TTL, stale-while-revalidate and per-key loading"""
+
+    def __init__(self, ttl=WCL_CACHE_TTL, stale=WCL_CACHE_STALE, max_entries=WCL_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.stale = stale
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._key_locks = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._stats = {'hit': 0, 'stale': 0, 'miss': 0, 'error': 0, 'refreshes': 0, 'refresh_errors': 0}
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def peek(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, value, etag):
+        entry = CacheEntry(value, etag)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._key_locks.pop(evicted, None)
+        return entry
+
+    def _refresh(self, key, loader):
+        try:
+            with self._key_lock(key):
+                value, etag = loader()
+                self.put(key, value, etag)
+            self._count('refreshes')
+        except Exception as e:
+            self._count('refresh_errors')
+            logging.warning(f"Background refresh of {key} failed, still serving the cached snapshot: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _refresh_in_background(self, key, loader):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        threading.Thread(target=self._refresh, args=(key, loader), name="wcl-cache-refresh", daemon=True).start()
+
+    def get(self, key, loader):
+        """Return (entry, state) for key, calling loader() -> (value, etag) when needed
+
+        state is 'hit' (fresh), 'stale' (served while a refresh runs), 'miss'
+        (loaded for this request) or 'error' (reload failed, old entry served).
+        """
+        entry = self.peek(key)
+        if entry is not None and entry.age() < self.ttl:
+            self._count('hit')
+            return entry, 'hit'
+        if entry is not None and entry.age() < self.ttl + self.stale:
+            self._refresh_in_background(key, loader)
+            self._count('stale')
+            return entry, 'stale'
+
+        with self._key_lock(key):
+            # Another request may have loaded it while this one waited
+            current = self.peek(key)
+            if current is not None and current is not entry and current.age() < self.ttl:
+                self._count('hit')
+                return current, 'hit'
+            try:
+                value, etag = loader()
+            except Exception as e:
+                if entry is None:
+                    raise
+                self._count('error')
+                logging.warning(f"Reload of {key} failed, serving a snapshot {entry.age():.0f}s old: {str(e)}")
+                return entry, 'error'
+            self._count('miss')
+            return self.put(key, value, etag), 'miss'
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'refreshing': len(self._refreshing),
+                'ttl_seconds': self.ttl,
+                'stale_seconds': self.stale,
+                **self._stats
+            }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_snapshot_cache():
+    """Return the process-wide cache, creating it on first use"""
+    global _cache
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SnapshotCache()
+    return _cache
+
+def reset_snapshot_cache(cache=None):
+    """Replace the process-wide cache (tests)"""
+    global _cache
+    with _cache_lock:
+        _cache = cache
@@ -0,0 +1,57 @@
+"""
+Durable Functions triggers for the scheduled scrape matrix
+
+azure.durable_functions pulls in aiohttp and is most of the app's cold
+import, so its triggers live in this blueprint instead of on the app.
+function_app registers it only when WCL_DURABLE_ENABLED is true; the HTTP
+routes and the compaction timer never load it otherwise. The orchestration
+and activity bodies stay in function_app (run_matrix_locally uses them
+without the runtime); the wrappers here only bind them to triggers.
+"""
+
+import logging
+from datetime import datetime, timezone
+
+import azure.functions as func
+import azure.durable_functions as df
+
+# Only imported from the bottom of function_app, once everything below is defined
+import function_app
+
+bp = df.Blueprint()
+
+@bp.timer_trigger(schedule="0 5 * * * *", arg_name="timer", run_on_startup=False)
+@bp.durable_client_input(client_name="client")
+async def wcl_matrix_timer_trigger(timer: func.TimerRequest, client) -> None:
+    # One instance per hour; a re-fire within the hour resumes the same run
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H")
+    instance_id = f"wcl-matrix-{run_id}"
+
+    status = await client.get_status(instance_id)
+    if status and status.runtime_status in (df.OrchestrationRuntimeStatus.Running, df.OrchestrationRuntimeStatus.Pending):
+        logging.info(f"Matrix orchestration {instance_id} is already running")
+        return
+
+    await client.start_new('wcl_matrix_orchestrator', instance_id, {'run_id': run_id})
+    logging.info(f"Started matrix orchestration {instance_id}")
+
+@bp.orchestration_trigger(context_name="context")
+def wcl_matrix_orchestrator(context: df.DurableOrchestrationContext):
+    result = yield from function_app.wcl_matrix_orchestration(context)
+    return result
+
+@bp.activity_trigger(input_name="payload")
+def plan_matrix_run(payload):
+    return function_app.plan_matrix_run_activity(payload)
+
+@bp.activity_trigger(input_name="payload")
+def scrape_matrix_shard(payload):
+    return function_app.scrape_matrix_shard_activity(payload)
+
+@bp.activity_trigger(input_name="payload")
+def checkpoint_matrix_run(payload):
+    return function_app.checkpoint_matrix_run_activity(payload)
+
+@bp.activity_trigger(input_name="payload")
+def finalize_matrix_run(payload):
+    return function_app.finalize_matrix_run_activity(payload)
@@ -0,0 +1,224 @@
+"""
+Shared HTTP session for Warcraft Logs requests
+
+The session is created once per process so keep-alive connections are reused
+across requests and across warm Azure Function invocations.
+"""
+
+import os
+import time
+import logging
+import weakref
+import threading
+from functools import partial
+import wcl_metrics
+import wcl_ratelimit
+from wcl_ratelimit import RETRY_STATUSES, WCL_MAX_RETRIES, WCL_RETRY_MAX
+
+# Point at replay_server.py (e.g. http://127.0.0.1:8765) to run without the live site
+WCL_BASE_URL = os.environ.get('WCL_BASE_URL', "https://www.warcraftlogs.com").rstrip('/')
+WCL_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# Separate connect/read timeouts so a dead host fails fast but slow tables still load
+WCL_CONNECT_TIMEOUT = float(os.environ.get('WCL_CONNECT_TIMEOUT', '5'))
+WCL_READ_TIMEOUT = float(os.environ.get('WCL_READ_TIMEOUT', '30'))
+
+# Keep-alive connections held per host; should be at least WCL_MAX_CONCURRENCY
+WCL_HTTP_POOL_SIZE = int(os.environ.get('WCL_HTTP_POOL_SIZE', '16'))
+
+_session = None
+_session_lock = threading.Lock()
+_timed_adapter_class = None
+
+def get_accept_encoding():
+    """Return the content encodings urllib3 can decode in this environment"""
+    encodings = ['gzip', 'deflate']
+
+    # urllib3 only decodes brotli when one of these packages is installed
+    try:
+        import brotli  # noqa: F401
+        encodings.append('br')
+    except ImportError:
+        try:
+            import brotlicffi  # noqa: F401
+            encodings.append('br')
+        except ImportError:
+            pass
+
+    return ', '.join(encodings)
+
+def get_timed_adapter_class():
+    """HTTPAdapter whose new connections report connect and TLS time to wcl_metrics"""
+    global _timed_adapter_class
+
+    if _timed_adapter_class is not None:
+        return _timed_adapter_class
+
+    # requests (and urllib3) load on the first fetch rather than at cold start
+    from requests.adapters import HTTPAdapter
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    class TimedConnectionMixin:
+        # _new_conn covers DNS + TCP (urllib3 resolves inside create_connection); the rest of connect() is TLS
+        def _new_conn(self):
+            start = time.perf_counter()
+            sock = super()._new_conn()
+            self._socket_ms = (time.perf_counter() - start) * 1000
+            return sock
+
+        def connect(self):
+            self._socket_ms = 0.0
+            start = time.perf_counter()
+            super().connect()
+            total_ms = (time.perf_counter() - start) * 1000
+
+            metrics = wcl_metrics.current()
+            metrics.add('connections_opened')
+            metrics.add('connect_ms', self._socket_ms)
+            metrics.add('tls_ms', max(0.0, total_ms - self._socket_ms))
+
+    class TimedHTTPConnection(TimedConnectionMixin, HTTPConnection):
+        pass
+
+    class TimedHTTPSConnection(TimedConnectionMixin, HTTPSConnection):
+        pass
+
+    class TimedHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = TimedHTTPConnection
+
+    class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = TimedHTTPSConnection
+
+    class TimedHTTPAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {
+                'http': TimedHTTPConnectionPool,
+                'https': TimedHTTPSConnectionPool
+            }
+
+    _timed_adapter_class = TimedHTTPAdapter
+    return _timed_adapter_class
+
+def create_session(pool_size=None):
+    """Build a requests session with a sized connection pool and default headers"""
+    import requests
+
+    pool_size = pool_size or WCL_HTTP_POOL_SIZE
+
+    session = requests.Session()
+    adapter = get_timed_adapter_class()(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    session.headers.update({
+        'User-Agent': WCL_USER_AGENT,
+        'Accept-Encoding': get_accept_encoding(),
+        'Connection': 'keep-alive'
+    })
+    return session
+
+def get_session():
+    """Return the process-wide session, creating it on first use"""
+    global _session
+
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+def get(url, headers=None, timeout=None, max_retries=None, **kwargs):
+    """GET a URL through the shared session, rate limited and retried on 429/5xx"""
+    if timeout is None:
+        timeout = (WCL_CONNECT_TIMEOUT, WCL_READ_TIMEOUT)
+    max_retries = WCL_MAX_RETRIES if max_retries is None else max_retries
+    limiter = wcl_ratelimit.get_rate_limiter()
+    metrics = wcl_metrics.current()
+    session = get_session()
+    import requests
+
+    # Transient failures; a body cut off mid-read surfaces as the last two
+    retryable = (
+        requests.ConnectionError,
+        requests.Timeout,
+        requests.exceptions.ChunkedEncodingError,
+        requests.exceptions.ContentDecodingError
+    )
+
+    for attempt in range(max_retries + 1):
+        with metrics.timer('throttle_wait_ms'):
+            limiter.before_request()
+        metrics.add('requests')
+        response = None
+        try:
+            start = time.perf_counter()
+            response = session.get(url, headers=headers, timeout=timeout, **kwargs)
+            total_ms = (time.perf_counter() - start) * 1000
+        except retryable as e:
+            metrics.add('request_errors')
+            if attempt == max_retries:
+                raise
+            delay = wcl_ratelimit.backoff_delay(attempt)
+            logging.warning(f"Request to {url} failed ({e}), retry {attempt + 1}/{max_retries} in {delay:.2f}s")
+        finally:
+            # Whatever went wrong, a request without a response must hand its slot back
+            if response is None:
+                limiter.after_error()
+        if response is not None:
+            retry_after = wcl_ratelimit.parse_retry_after(response.headers.get('Retry-After'))
+            # Hand the last attempt, or a wait longer than we're willing to sit out, to the caller
+            final = (
+                response.status_code not in RETRY_STATUSES or attempt == max_retries
+                or (retry_after is not None and retry_after > WCL_RETRY_MAX)
+            )
+            release = partial(limiter.after_response, response.status_code, retry_after)
+            if final and kwargs.get('stream'):
+                # The body is still to be read, so the slot stays taken until the caller closes it
+                release_on_close(response, release)
+            else:
+                release()
+
+            # elapsed runs from sending the request to parsing the headers
+            ttfb_ms = response.elapsed.total_seconds() * 1000
+            metrics.add('ttfb_ms', ttfb_ms)
+            if not kwargs.get('stream'):
+                # Streamed bodies are read (and counted) by the caller
+                metrics.add('download_ms', max(0.0, total_ms - ttfb_ms))
+                record_response_bytes(response)
+
+            if final:
+                return response
+
+            # Retry-After is a floor; jitter on top keeps throttled threads from waking together
+            delay = max(retry_after or 0, wcl_ratelimit.backoff_delay(attempt))
+            if retry_after is not None:
+                delay += wcl_ratelimit.backoff_delay(0)
+            logging.warning(f"HTTP {response.status_code} from {url}, retry {attempt + 1}/{max_retries} in {delay:.2f}s")
+            response.close()
+
+        limiter.record_retry()
+        metrics.add('retries')
+        time.sleep(delay)
+
+def release_on_close(response, release):
+    """Call release() once, when the response is closed or, failing that, garbage collected"""
+    finalizer = weakref.finalize(response, release)
+    close = response.close
+
+    def close_and_release():
+        try:
+            close()
+        finally:
+            finalizer()
+
+    response.close = close_and_release
+
+def record_response_bytes(response):
+    """Count a consumed response's bytes on the wire and after decompression"""
+    metrics = wcl_metrics.current()
+    metrics.add('bytes_downloaded', len(response.content))
+    # urllib3 tracks the raw (still compressed) bytes it read
+    if hasattr(response.raw, 'tell'):
+        metrics.add('wire_bytes', response.raw.tell())
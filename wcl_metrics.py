@@ -0,0 +1,161 @@
+"""
+Per-invocation timing and byte metrics
+
+Code on the fetch/parse/upload path records into wcl_metrics.current(),
+which is a no-op unless an invocation() is active. When the invocation
+ends its totals go to the configured exporter:
+
+    WCL_METRICS_EXPORTER=appinsights  OpenTelemetry histograms (Azure Monitor when
+                                      APPLICATIONINSIGHTS_CONNECTION_STRING is set)
+    WCL_METRICS_EXPORTER=stdout       one JSON line per invocation
+    WCL_METRICS_EXPORTER=none         nothing (default without a connection string)
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+METER_NAME = 'wcl_data_importer'
+
+_current = contextvars.ContextVar('wcl_metrics', default=None)
+
+class InvocationMetrics:
+    """Thread-safe accumulator for one invocation's metrics"""
+
+    def __init__(self, name, **dimensions):
+        self.name = name
+        self.dimensions = dimensions
+        self.values = {}
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, key, value=1):
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    @contextmanager
+    def timer(self, key):
+        """Add the elapsed milliseconds of the block to `key`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(key, (time.perf_counter() - start) * 1000)
+
+    def snapshot(self):
+        with self._lock:
+            values = dict(self.values)
+        values['total_ms'] = (time.perf_counter() - self._started) * 1000
+        return {key: round(value, 2) if isinstance(value, float) else value for key, value in sorted(values.items())}
+
+class _NullMetrics:
+    """Stand-in used outside an invocation so callers never check for None"""
+
+    def add(self, key, value=1):
+        pass
+
+    @contextmanager
+    def timer(self, key):
+        yield
+
+    def snapshot(self):
+        return {}
+
+NULL_METRICS = _NullMetrics()
+
+def current():
+    """The active invocation's metrics, or a no-op recorder"""
+    return _current.get() or NULL_METRICS
+
+def propagate(func):
+    """Wrap func so it records into the caller's invocation when run on a pool thread"""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # A context can only be entered by one thread at a time, so each call gets a copy
+        return context.copy().run(func, *args, **kwargs)
+    return run
+
+class StdoutExporter:
+    def export(self, metrics):
+        snapshot = {'metric_set': metrics.name, **metrics.dimensions, **metrics.snapshot()}
+        sys.stdout.write(json.dumps(snapshot, default=str) + '\n')
+        sys.stdout.flush()
+
+class NullExporter:
+    def export(self, metrics):
+        pass
+
+class AppInsightsExporter:
+    """Record each value on an OpenTelemetry histogram named <metric_set>.<key>"""
+
+    def __init__(self):
+        if os.environ.get('APPLICATIONINSIGHTS_CONNECTION_STRING'):
+            try:
+                from azure.monitor.opentelemetry import configure_azure_monitor
+                configure_azure_monitor()
+            except ImportError:
+                logging.warning("azure-monitor-opentelemetry not installed; metrics go to the default OpenTelemetry provider")
+
+        from opentelemetry import metrics
+        self._meter = metrics.get_meter(METER_NAME)
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def _histogram(self, name):
+        with self._lock:
+            if name not in self._histograms:
+                unit = 'ms' if name.endswith('_ms') else 'By' if 'bytes' in name else '1'
+                self._histograms[name] = self._meter.create_histogram(name, unit=unit)
+            return self._histograms[name]
+
+    def export(self, metrics):
+        attributes = {key: str(value) for key, value in metrics.dimensions.items()}
+        for key, value in metrics.snapshot().items():
+            self._histogram(f"{metrics.name}.{key}").record(value, attributes=attributes)
+
+EXPORTERS = {
+    'appinsights': AppInsightsExporter,
+    'stdout': StdoutExporter,
+    'none': NullExporter
+}
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+def get_exporter():
+    """Return the process-wide exporter, created from WCL_METRICS_EXPORTER on first use"""
+    global _exporter
+
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                default = 'appinsights' if os.environ.get('APPLICATIONINSIGHTS_CONNECTION_STRING') else 'none'
+                name = os.environ.get('WCL_METRICS_EXPORTER', default).lower()
+                try:
+                    _exporter = EXPORTERS[name]()
+                except KeyError:
+                    raise ValueError(f"Unknown metrics exporter '{name}'. Available: {', '.join(EXPORTERS)}")
+                except ImportError as e:
+                    logging.warning(f"Metrics exporter '{name}' unavailable ({e}), falling back to stdout")
+                    _exporter = StdoutExporter()
+    return _exporter
+
+@contextmanager
+def invocation(name, **dimensions):
+    """Collect metrics for the enclosed block and export them when it ends"""
+    metrics = InvocationMetrics(name, **dimensions)
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+        try:
+            get_exporter().export(metrics)
+        except Exception as e:
+            logging.warning(f"Failed to export metrics: {str(e)}")
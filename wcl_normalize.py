@@ -0,0 +1,190 @@
+"""
+Batch cleaning and validation of scraped score/parses columns
+
+Raw cell text from the parsers is cleaned, parsed and range-checked a whole
+column at a time. Rows that fail are returned with a reason instead of
+being coerced to 0. Large inputs (a full matrix run) go through Arrow
+compute kernels; small ones (a single table) use the equivalent
+pure-Python path so a page scrape doesn't pay for importing pyarrow.
+"""
+
+import os
+import re
+import time
+import logging
+from array import array
+from itertools import compress
+import wcl_metrics
+from wcl_records import RecordBatch, RecordSet
+
+# Normalized scores are 0-100; widen these if non-normalized tables are scraped
+SCORE_MIN = float(os.environ.get('WCL_SCORE_MIN', '0'))
+SCORE_MAX = float(os.environ.get('WCL_SCORE_MAX', '100'))
+
+# Below this many rows the Arrow conversion overhead outweighs the per-row loop
+VECTORIZE_MIN_ROWS = int(os.environ.get('WCL_VECTORIZE_MIN_ROWS', '1000'))
+
+# Accepted cell formats, checked against the raw text before anything is stripped:
+# whitespace, thousands separators and (for scores) a percent sign. Anything else
+# ("1e3", "12 (3)", "1.2.3") is rejected rather than reshaped into a number. The
+# sign is accepted so negatives fail the range check; 18 digits keep parse counts
+# inside int64. Digits and spaces are spelled out so Python's re and Arrow's RE2
+# accept exactly the same cells.
+CELL_SPACE = r'[ \t\n\r\f\v\xa0]*'
+SCORE_FORMAT = rf'{CELL_SPACE}-?(?:(?:[0-9]{{1,3}}(?:,[0-9]{{3}})+|[0-9]+)(?:\.[0-9]*)?|\.[0-9]+){CELL_SPACE}%?{CELL_SPACE}'
+PARSES_FORMAT = rf'{CELL_SPACE}-?(?:[0-9]{{1,3}}(?:,[0-9]{{3}}){{1,5}}|[0-9]{{1,18}}){CELL_SPACE}'
+
+# Removed from accepted cells before the cast
+SCORE_SEPARATORS = r'[ \t\n\r\f\v\xa0,%]'
+PARSES_SEPARATORS = r'[ \t\n\r\f\v\xa0,]'
+
+_score_format = re.compile(SCORE_FORMAT)
+_parses_format = re.compile(PARSES_FORMAT)
+_score_separators = re.compile(SCORE_SEPARATORS)
+_parses_separators = re.compile(PARSES_SEPARATORS)
+
+def _reason(class_name, spec_name, score, parses):
+    """Why a cleaned row is rejected, or None when it is valid"""
+    if not class_name or not spec_name:
+        return 'missing_class_or_spec'
+    if score is None:
+        return 'invalid_score'
+    if not SCORE_MIN <= score <= SCORE_MAX:
+        return 'score_out_of_range'
+    if parses is None:
+        return 'invalid_parses'
+    if parses < 0:
+        return 'parses_out_of_range'
+    return None
+
+def clean_columns_python(classes, specs, scores, parses):
+    """Row-at-a-time reference: returns (score values, parses values, reasons, valid mask)"""
+    score_values = []
+    parses_values = []
+    reasons = []
+
+    for class_name, spec_name, score_text, parses_text in zip(classes, specs, scores, parses):
+        score = float(_score_separators.sub('', score_text)) if _score_format.fullmatch(score_text) else None
+        count = int(_parses_separators.sub('', parses_text)) if _parses_format.fullmatch(parses_text) else None
+
+        score_values.append(score)
+        parses_values.append(count)
+        reasons.append(_reason(class_name, spec_name, score, count))
+
+    return score_values, parses_values, reasons, [reason is None for reason in reasons]
+
+def _parse_column(pc, values, pattern, separators, target):
+    """Null out cells not matching pattern, strip separators from the rest and cast"""
+    matches = pc.match_substring_regex(values, f'^(?:{pattern})$')
+    cleaned = pc.replace_substring_regex(pc.if_else(matches, values, None), separators, '')
+    return pc.cast(cleaned, target)
+
+def clean_columns_arrow(classes, specs, scores, parses):
+    """Vectorized equivalent of clean_columns_python"""
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    score_values = _parse_column(pc, pa.array(scores, pa.string()), SCORE_FORMAT, SCORE_SEPARATORS, pa.float64())
+    parses_values = _parse_column(pc, pa.array(parses, pa.string()), PARSES_FORMAT, PARSES_SEPARATORS, pa.int64())
+
+    def flags(mask):
+        return mask.to_numpy(zero_copy_only=False)
+
+    names_missing = flags(pc.or_(
+        pc.equal(pc.utf8_length(pa.array(classes, pa.string())), 0),
+        pc.equal(pc.utf8_length(pa.array(specs, pa.string())), 0)
+    ))
+    # Null comparisons stay null; fill so they don't mask the invalid_* checks
+    score_out_of_range = flags(pc.fill_null(pc.or_(pc.less(score_values, SCORE_MIN), pc.greater(score_values, SCORE_MAX)), False))
+    parses_out_of_range = flags(pc.fill_null(pc.less(parses_values, 0), False))
+
+    # Same precedence as _reason(): the first failing check names the row
+    reasons = np.select(
+        [
+            names_missing,
+            flags(pc.is_null(score_values)),
+            score_out_of_range,
+            flags(pc.is_null(parses_values)),
+            parses_out_of_range
+        ],
+        ['missing_class_or_spec', 'invalid_score', 'score_out_of_range', 'invalid_parses', 'parses_out_of_range'],
+        default=''
+    )
+
+    return (
+        pc.fill_null(score_values, 0.0).to_numpy(),
+        pc.fill_null(parses_values, 0).to_numpy(),
+        reasons,
+        reasons == ''
+    )
+
+def _take(values, valid, start, end, typecode):
+    """Packed array of the valid values in [start, end), without a Python loop for NumPy input"""
+    if hasattr(values, 'tobytes'):
+        return array(typecode, values[start:end][valid[start:end]].tobytes())
+    return array(typecode, compress(values[start:end], valid[start:end]))
+
+def clean_columns(classes, specs, scores, parses, vectorize=None):
+    """Pick the Arrow or pure-Python path by size (or explicitly)"""
+    if vectorize is None:
+        vectorize = len(scores) >= VECTORIZE_MIN_ROWS
+    if vectorize:
+        return clean_columns_arrow(classes, specs, scores, parses)
+    return clean_columns_python(classes, specs, scores, parses)
+
+def normalize_batches(raw_batches, vectorize=None):
+    """Clean every raw batch in one pass; returns a RecordSet whose batches carry their rejected rows"""
+    metrics = wcl_metrics.current()
+    start = time.perf_counter()
+
+    classes, specs, scores, parses = [], [], [], []
+    for raw in raw_batches:
+        classes += raw.classes
+        specs += raw.specs
+        scores += raw.scores
+        parses += raw.parses
+
+    score_values, parses_values, reasons, valid = clean_columns(classes, specs, scores, parses, vectorize)
+    valid_flags = valid.tolist() if hasattr(valid, 'tolist') else valid
+
+    records = RecordSet()
+    offset = 0
+    for raw in raw_batches:
+        end = offset + len(raw)
+        flags = valid_flags[offset:end]
+
+        batch = RecordBatch.from_columns(
+            compress(raw.classes, flags),
+            compress(raw.specs, flags),
+            _take(score_values, valid, offset, end, 'd'),
+            _take(parses_values, valid, offset, end, 'q'),
+            raw.scraped_at,
+            **raw.tags
+        )
+        batch.source = raw.source
+        batch.rejected = [
+            {
+                'class': classes[index],
+                'spec': specs[index],
+                'score': scores[index],
+                'parses': parses[index],
+                'reason': str(reasons[index]),
+                'scraped_at': raw.scraped_at,
+                **raw.tags
+            }
+            for index in range(offset, end) if not valid_flags[index]
+        ]
+        records.add(batch)
+        offset = end
+
+    rejected = records.rejected
+    metrics.add('normalize_ms', (time.perf_counter() - start) * 1000)
+    metrics.add('rows_rejected', len(rejected))
+    if rejected:
+        logging.warning(f"Rejected {len(rejected)}/{len(classes)} rows failing validation, e.g. {rejected[:3]}")
+    return records
+
+def normalize_batch(raw, vectorize=None):
+    """Clean one raw batch into a RecordBatch (see normalize_batches)"""
+    return normalize_batches([raw], vectorize).batches[0]
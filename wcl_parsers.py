@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""
+Parser backends for the WCL summary table
+
+The BeautifulSoup `html.parser` backend is the reference implementation; the
+faster backends must produce identical rows (see check_parser_parity).
+
+extract_rows() runs the extraction strategies in order on a document:
+rows decoded straight from JSON state embedded in a script, then the
+summary table DOM, then a text rendering of the table (see parse_text_data).
+"""
+
+import io
+import os
+import re
+import sys
+import json
+import time
+import codecs
+import logging
+from datetime import datetime, timezone
+from html.parser import HTMLParser
+import wcl_metrics
+import wcl_normalize
+from wcl_records import RawRecordBatch, CLASS_SPECS
+
+DEFAULT_PARSER_BACKEND = os.environ.get('WCL_PARSER_BACKEND', 'lxml')
+
+# The strainer sees the raw class attribute ("summary-table dataTable"), not a list
+SUMMARY_TABLE_CLASS = re.compile(r'(^|\s)summary-table(\s|$)')
+
+EXTRACTION_STRATEGIES = os.environ.get('WCL_EXTRACTION_STRATEGIES', 'embedded,dom,text').split(',')
+
+# Script state sits in the <head>, so only assignments starting this early are decoded
+EMBEDDED_SCAN_CHARS = int(os.environ.get('WCL_EMBEDDED_SCAN_CHARS', str(256 * 1024)))
+
+# Where a JSON value starts: `window.__INITIAL_STATE__ = {`, `var x = [`, or a JSON script tag.
+# Assignments are found from the `=` (a literal re can skip to) and the target checked after.
+EMBEDDED_ASSIGNMENT = re.compile(r'=\s*(?=[\[{])')
+EMBEDDED_TARGET = re.compile(r'(?:window\.[\w$]+|\b(?:var|let|const)\s+[\w$]+)\s*$')
+EMBEDDED_SCRIPT = re.compile(r'<script\b[^>]*\btype=["\']application/(?:ld\+)?json["\'][^>]*>\s*')
+
+# Key names of a row in the statistics state (see embedded_state.html), first match wins
+EMBEDDED_FIELDS = {
+    'class': ('class',),
+    'spec': ('spec',),
+    'score': ('score',),
+    'parses': ('parses',)
+}
+
+# A row list is only the summary table if its rows are known class/spec pairs
+# covering at least this many specs; the class=Any table lists all of them
+EMBEDDED_MIN_SPECS = int(os.environ.get('WCL_EMBEDDED_MIN_SPECS', '20'))
+KNOWN_SPECS = frozenset((class_name, spec) for class_name, specs in CLASS_SPECS.items() for spec in specs)
+
+# Objects visited per blob while looking for the row list
+EMBEDDED_MAX_NODES = 20000
+
+_json_decoder = json.JSONDecoder()
+_camel_words = re.compile(r'(?<=[a-z])(?=[A-Z])')
+
+def _rows_from_soup_table(table, scraped_at):
+    """Walk a BeautifulSoup summary table and collect the raw cell text"""
+    data = RawRecordBatch(scraped_at)
+
+    # Extract data from table
+    tbody = table.find('tbody')
+    if tbody:
+        rows = tbody.find_all('tr')
+    else:
+        # If no tbody, get all rows and skip the first one (header)
+        all_rows = table.find_all('tr')
+        rows = all_rows[1:] if len(all_rows) > 1 else []
+
+    for row in rows:
+        cells = row.find_all('td')
+        if len(cells) >= 5:  # Ensure we have all required columns
+            # Extract text content only, removing images and extra whitespace
+            # Skip max column (cells[3])
+            data.append(
+                cells[0].get_text(strip=True),
+                cells[1].get_text(strip=True),
+                cells[2].get_text(strip=True),
+                cells[4].get_text(strip=True)
+            )
+
+    return data
+
+def parse_with_soup(content, scraped_at):
+    """Reference backend: full BeautifulSoup tree with the pure-Python html.parser"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(content, 'html.parser')
+    table = soup.find('table', class_='summary-table')
+    return _rows_from_soup_table(table, scraped_at) if table else RawRecordBatch(scraped_at)
+
+def parse_with_strainer(content, scraped_at):
+    """BeautifulSoup restricted to table.summary-table so the rest of the page is never built"""
+    from bs4 import BeautifulSoup, SoupStrainer
+    only_table = SoupStrainer('table', class_=SUMMARY_TABLE_CLASS)
+    soup = BeautifulSoup(content, 'html.parser', parse_only=only_table)
+    table = soup.find('table', class_='summary-table')
+    return _rows_from_soup_table(table, scraped_at) if table else RawRecordBatch(scraped_at)
+
+def parse_with_lxml(content, scraped_at):
+    """libxml2-backed parse with XPath row selection"""
+    import lxml.html
+
+    if not content or not content.strip():
+        return RawRecordBatch(scraped_at)
+
+    doc = lxml.html.fromstring(content)
+    tables = doc.xpath('//table[contains(concat(" ", normalize-space(@class), " "), " summary-table ")]')
+    if not tables:
+        return RawRecordBatch(scraped_at)
+    table = tables[0]
+
+    tbody = table.find('.//tbody')
+    if tbody is not None:
+        rows = tbody.findall('.//tr')
+    else:
+        all_rows = table.findall('.//tr')
+        rows = all_rows[1:] if len(all_rows) > 1 else []
+
+    data = RawRecordBatch(scraped_at)
+    for row in rows:
+        cells = row.findall('.//td')
+        if len(cells) >= 5:
+            # Same as get_text(strip=True): strip each text node, join without spaces
+            text = [''.join(part.strip() for part in cell.itertext()) for cell in cells]
+            data.append(text[0], text[1], text[2], text[4])
+
+    return data
+
+def parse_with_selectolax(content, scraped_at):
+    """Lexbor-backed parse via selectolax CSS selectors"""
+    from selectolax.lexbor import LexborHTMLParser
+
+    tree = LexborHTMLParser(content)
+    table = tree.css_first('table.summary-table')
+    if table is None:
+        return RawRecordBatch(scraped_at)
+
+    tbody = table.css_first('tbody')
+    if tbody is not None:
+        rows = tbody.css('tr')
+    else:
+        all_rows = table.css('tr')
+        rows = all_rows[1:] if len(all_rows) > 1 else []
+
+    data = RawRecordBatch(scraped_at)
+    for row in rows:
+        cells = row.css('td')
+        if len(cells) >= 5:
+            text = [cell.text(deep=True, separator='', strip=True) for cell in cells]
+            data.append(text[0], text[1], text[2], text[4])
+
+    return data
+
+class SummaryTableStreamParser(HTMLParser):
+    """Incremental parser that collects summary table rows as each <tr> closes
+
+    Mirrors the reference walk: rows inside <tbody> when there is one,
+    otherwise every row after the first (header) row.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows = []
+        self.done = False
+        self._table_depth = 0
+        self._in_tbody = False
+        self._seen_tbody = False
+        self._outside_rows = 0
+        self._row = None
+        self._cell = None
+
+    def _flush_text(self):
+        # Strip each text node separately, like get_text(strip=True)
+        if self._cell is not None and self._text:
+            self._cell.append(''.join(self._text).strip())
+        self._text = []
+
+    def reset(self):
+        super().reset()
+        self._text = []
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        self._flush_text()
+
+        if tag == 'table':
+            if self._table_depth:
+                self._table_depth += 1
+            elif SUMMARY_TABLE_CLASS.search(dict(attrs).get('class') or ''):
+                self._table_depth = 1
+            return
+
+        if not self._table_depth:
+            return
+
+        if tag == 'tbody' and not self._seen_tbody:
+            self._in_tbody = True
+            self._seen_tbody = True
+        elif tag == 'tr':
+            self._row = []
+        elif tag == 'td' and self._row is not None:
+            self._cell = []
+            self._row.append(self._cell)
+
+    def handle_endtag(self, tag):
+        if self.done or not self._table_depth:
+            return
+        self._flush_text()
+
+        if tag == 'table':
+            self._table_depth -= 1
+            self.done = self._table_depth == 0
+        elif tag == 'tbody':
+            self._in_tbody = False
+        elif tag == 'td':
+            self._cell = None
+        elif tag == 'tr' and self._row is not None:
+            self._finish_row(self._row)
+            self._row = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._text.append(data)
+
+    def _finish_row(self, cells):
+        if self._in_tbody:
+            keep = True
+        elif self._seen_tbody:
+            keep = False
+        else:
+            # No tbody (yet): the first row is the header
+            self._outside_rows += 1
+            keep = self._outside_rows > 1
+
+        if keep and len(cells) >= 5:
+            text = [''.join(cell) for cell in cells]
+            self.rows.append((text[0], text[1], text[2], text[4]))
+
+def iter_summary_cells(chunks, encoding='utf-8'):
+    """Yield (class, spec, score, parses) cell text from HTML chunks, stopping once the table closes"""
+    parser = SummaryTableStreamParser()
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+
+    for chunk in chunks:
+        parser.feed(decoder.decode(chunk) if isinstance(chunk, bytes) else chunk)
+        yield from parser.rows
+        parser.rows.clear()
+        if parser.done:
+            return
+
+    parser.feed(decoder.decode(b'', final=True))
+    parser.close()
+    yield from parser.rows
+
+def parse_with_stream(content, scraped_at):
+    """Incremental html.parser backend (see iter_summary_cells for true streaming)"""
+    data = RawRecordBatch(scraped_at)
+    for cells in iter_summary_cells([content]):
+        data.append(*cells)
+    return data
+
+PARSER_BACKENDS = {
+    'soup': parse_with_soup,
+    'strainer': parse_with_strainer,
+    'lxml': parse_with_lxml,
+    'selectolax': parse_with_selectolax,
+    'stream': parse_with_stream
+}
+
+_unavailable_backends = set()
+
+def get_parser_backend(name=None):
+    """Return the parse function for a backend, falling back when its library is missing"""
+    name = name or DEFAULT_PARSER_BACKEND
+    if name not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown parser backend: {name}")
+
+    if name in _unavailable_backends:
+        return parse_with_strainer
+    return PARSER_BACKENDS[name]
+
+def parse_summary_table(content, scraped_at=None, backend=None, normalize=True):
+    """Extract class/spec rows from HTML containing the WCL summary table
+
+    Returns a validated RecordBatch, or the RawRecordBatch with normalize=False
+    so callers can clean many tables in one wcl_normalize pass.
+    """
+    if scraped_at is None:
+        scraped_at = datetime.now(timezone.utc).isoformat()
+
+    name = backend or DEFAULT_PARSER_BACKEND
+    metrics = wcl_metrics.current()
+    with metrics.timer('parse_ms'):
+        try:
+            rows = get_parser_backend(name)(content, scraped_at)
+        except ImportError as e:
+            logging.warning(f"Parser backend '{name}' unavailable, using 'strainer': {str(e)}")
+            _unavailable_backends.add(name)
+            rows = parse_with_strainer(content, scraped_at)
+    metrics.add('rows_parsed', len(rows))
+
+    if not normalize:
+        return rows
+    return wcl_normalize.normalize_batch(rows)
+
+def iter_embedded_json(text, limit=None, needle=None):
+    """Yield (offset, value) for each JSON value assigned in a script within the first `limit` chars
+
+    With a needle, only the values whose assignment is the closest one before
+    an occurrence of it are decoded, so unrelated state is never parsed.
+    """
+    limit = EMBEDDED_SCAN_CHARS if limit is None else limit
+
+    # (assignment offset, value offset) in document order
+    starts = []
+    for match in EMBEDDED_ASSIGNMENT.finditer(text, 0, limit):
+        target = EMBEDDED_TARGET.search(text, max(0, match.start() - 100), match.start())
+        if target:
+            starts.append((target.start(), match.end()))
+    starts += [(match.start(), match.end()) for match in EMBEDDED_SCRIPT.finditer(text, 0, limit)]
+    starts.sort()
+
+    if needle is not None:
+        candidates = []
+        index = 0
+        position = text.find(needle)
+        while position != -1 and index < len(starts):
+            # Last assignment starting before this occurrence
+            while index + 1 < len(starts) and starts[index + 1][0] < position:
+                index += 1
+            if starts[index][0] < position and (not candidates or candidates[-1] != starts[index]):
+                candidates.append(starts[index])
+            position = text.find(needle, position + 1)
+        starts = candidates
+
+    for offset, value_offset in starts:
+        try:
+            value, _ = _json_decoder.raw_decode(text, value_offset)
+        except ValueError:
+            # JS object literal, function call, truncated blob... not JSON
+            continue
+        yield offset, value
+
+def _row_keys(item):
+    """Map each field to the key it uses in `item`, or None if a field is missing"""
+    keys = {}
+    for field, names in EMBEDDED_FIELDS.items():
+        key = next((name for name in names if name in item), None)
+        if key is None:
+            return None
+        keys[field] = key
+    return keys
+
+def _display_name(value):
+    # Embedded state uses identifiers like "DeathKnight" / "BeastMastery"
+    return _camel_words.sub(' ', value) if isinstance(value, str) else ''
+
+def _is_summary_table(rows, keys):
+    """True when every row is a known class/spec pair and enough specs are covered"""
+    pairs = set()
+    for row in rows:
+        if not isinstance(row, dict):
+            return False
+        pair = (_display_name(row.get(keys['class'])), _display_name(row.get(keys['spec'])))
+        if pair not in KNOWN_SPECS:
+            return False
+        pairs.add(pair)
+    return len(pairs) >= EMBEDDED_MIN_SPECS
+
+def find_embedded_rows(value):
+    """Breadth-first search for the first list of summary table rows; returns (rows, keys) or (None, None)"""
+    queue = [value]
+    for node in queue:
+        if len(queue) > EMBEDDED_MAX_NODES:
+            break
+        if isinstance(node, dict):
+            queue.extend(child for child in node.values() if isinstance(child, (dict, list)))
+        elif isinstance(node, list) and node:
+            keys = _row_keys(node[0]) if isinstance(node[0], dict) else None
+            if keys and _is_summary_table(node, keys):
+                return node, keys
+            queue.extend(child for child in node if isinstance(child, (dict, list)))
+    return None, None
+
+def parse_embedded_state(content, scraped_at):
+    """Rows decoded from the first JSON state blob in the page that holds them"""
+    data = RawRecordBatch(scraped_at)
+    if isinstance(content, bytes):
+        # Cheap reject before decoding: rows need a spec key in the JSON
+        if b'"spec' not in content:
+            return data
+        content = content.decode('utf-8', errors='replace')
+
+    for _, value in iter_embedded_json(content, needle='"spec'):
+        rows, keys = find_embedded_rows(value)
+        if not rows:
+            continue
+        for row in rows:
+            data.append(
+                _display_name(row.get(keys['class'])),
+                _display_name(row.get(keys['spec'])),
+                str(row.get(keys['score'], '')),
+                str(row.get(keys['parses'], ''))
+            )
+        break
+
+    return data
+
+def parse_summary_dom(content, scraped_at):
+    """Raw rows from the summary table with the configured parser backend"""
+    return parse_summary_table(content, scraped_at, normalize=False)
+
+def parse_text_dump(content, scraped_at):
+    """Rows tokenized from a text rendering of the table ("Devastation83.73113.2828,751")"""
+    # Imported here: only documents that neither strategy above could read get this far
+    from parse_text_data import iter_text_cells
+
+    data = RawRecordBatch(scraped_at)
+    stream = io.BytesIO(content) if isinstance(content, bytes) else io.StringIO(content)
+    for cells in iter_text_cells(stream):
+        data.append(*cells)
+    return data
+
+STRATEGY_FUNCTIONS = {
+    'embedded': parse_embedded_state,
+    'dom': parse_summary_dom,
+    'text': parse_text_dump
+}
+
+def extract_rows(content, scraped_at=None, strategies=None):
+    """Try each extraction strategy in order until one finds rows
+
+    Returns (raw batch, winning strategy or None, {strategy: ms}). The batch
+    is tagged with its source, and every attempt is timed into the
+    extract_<strategy>_ms metric.
+    """
+    if scraped_at is None:
+        scraped_at = datetime.now(timezone.utc).isoformat()
+
+    metrics = wcl_metrics.current()
+    timings = {}
+    for name in strategies or EXTRACTION_STRATEGIES:
+        start = time.perf_counter()
+        rows = STRATEGY_FUNCTIONS[name](content, scraped_at)
+        elapsed = (time.perf_counter() - start) * 1000
+        timings[name] = round(elapsed, 3)
+        metrics.add(f'extract_{name}_ms', elapsed)
+        if rows:
+            rows.source = name
+            metrics.add(f'extracted_by_{name}')
+            return rows, name, timings
+
+    return RawRecordBatch(scraped_at), None, timings
+
+def check_parser_parity(content, backends=None):
+    """Compare every backend against the soup reference; returns {backend: problem}"""
+    scraped_at = datetime.now(timezone.utc).isoformat()
+    expected = parse_with_soup(content, scraped_at)
+    mismatches = {}
+
+    for name in backends or PARSER_BACKENDS:
+        if name == 'soup':
+            continue
+        try:
+            actual = PARSER_BACKENDS[name](content, scraped_at)
+        except ImportError as e:
+            mismatches[name] = f"unavailable: {str(e)}"
+            continue
+
+        if actual != expected:
+            mismatches[name] = f"{len(actual)} rows vs {len(expected)} from soup"
+
+    return mismatches
+
+if __name__ == "__main__":
+    paths = sys.argv[1:] or ['table_fragment.html', 'full_page.html', 'page_snippet.html']
+    failed = False
+
+    for path in paths:
+        with open(path, 'rb') as f:
+            content = f.read()
+
+        rows = len(parse_with_soup(content, None))
+        mismatches = check_parser_parity(content)
+
+        if mismatches:
+            for name, problem in mismatches.items():
+                print(f"✗ {path}: {name} - {problem}")
+            failed = failed or any(not p.startswith('unavailable') for p in mismatches.values())
+        else:
+            print(f"✓ {path}: all backends match soup ({rows} rows)")
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,168 @@
+"""
+Bounded-queue pipeline for multi-shard runs
+
+Fetch threads feed parse workers and parse workers feed uploaders through
+bounded queues, so network, CPU and storage I/O overlap while a slow stage
+holds the ones before it back instead of letting work pile up in memory.
+Parsing can run in a process pool (WCL_PIPELINE_PARSE_PROCESSES) when it is
+the CPU-bound stage; the parse function and its results must then pickle.
+
+    results, failures, stats = run_pipeline(shards, fetch, parse, upload)
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+import wcl_metrics
+
+WCL_PIPELINE_QUEUE_SIZE = int(os.environ.get('WCL_PIPELINE_QUEUE_SIZE', '8'))
+WCL_PIPELINE_PARSE_WORKERS = int(os.environ.get('WCL_PIPELINE_PARSE_WORKERS', '2'))
+WCL_PIPELINE_PARSE_PROCESSES = int(os.environ.get('WCL_PIPELINE_PARSE_PROCESSES', '0'))
+WCL_PIPELINE_UPLOAD_WORKERS = int(os.environ.get('WCL_PIPELINE_UPLOAD_WORKERS', '2'))
+
+_DONE = object()
+
+class StageStats:
+    """Busy time and item counts of one stage, plus the peak depth of the queue it feeds"""
+
+    __slots__ = ('busy', 'items', 'errors', 'queue_peak', '_lock')
+
+    def __init__(self):
+        self.busy = 0.0
+        self.items = 0
+        self.errors = 0
+        self.queue_peak = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, error=False):
+        with self._lock:
+            self.busy += seconds
+            self.items += 1
+            self.errors += error
+
+    def observe_queue(self, depth):
+        if depth > self.queue_peak:
+            self.queue_peak = depth
+
+    def snapshot(self):
+        return {
+            'busy_ms': round(self.busy * 1000, 2),
+            'items': self.items,
+            'errors': self.errors,
+            'queue_peak': self.queue_peak
+        }
+
+def _worker(stage, stats, inbox, outbox, call, failures, failures_lock):
+    """Take (item, value) off inbox, put (item, call(item, value)) on outbox until _DONE"""
+    while True:
+        entry = inbox.get()
+        if entry is _DONE:
+            return
+        item, value = entry
+
+        start = time.perf_counter()
+        try:
+            result = call(item, value)
+        except Exception as e:
+            stats.record(time.perf_counter() - start, error=True)
+            logging.error(f"Pipeline {stage} failed for {item}: {str(e)}")
+            with failures_lock:
+                failures.append({**item, 'stage': stage, 'error': str(e)}
+                                if isinstance(item, dict) else {'item': item, 'stage': stage, 'error': str(e)})
+            continue
+        stats.record(time.perf_counter() - start)
+
+        # Blocks while the next stage is behind: that is the backpressure
+        outbox.put((item, result))
+        if outbox.maxsize:
+            stats.observe_queue(outbox.qsize())
+
+def run_pipeline(items, fetch, parse, upload, fetch_workers=8, parse_workers=None,
+                 upload_workers=None, queue_size=None, parse_processes=None):
+    """Run fetch(item) -> parse(item, payload) -> upload(item, parsed) for every item
+
+    Returns (upload results in completion order as (item, result), failures,
+    stats). A failing item is dropped from later stages and listed in
+    failures with the stage it failed in.
+    """
+    parse_workers = parse_workers or WCL_PIPELINE_PARSE_WORKERS
+    upload_workers = upload_workers or WCL_PIPELINE_UPLOAD_WORKERS
+    queue_size = queue_size or WCL_PIPELINE_QUEUE_SIZE
+    parse_processes = WCL_PIPELINE_PARSE_PROCESSES if parse_processes is None else parse_processes
+
+    # The item source is just another queue, so fetchers share it without a lock of their own
+    sources = queue.Queue()
+    for item in items:
+        sources.put((item, None))
+    parse_queue = queue.Queue(maxsize=queue_size)
+    upload_queue = queue.Queue(maxsize=queue_size)
+    results = queue.Queue()
+
+    stats = {name: StageStats() for name in ('fetch', 'parse', 'upload')}
+    failures = []
+    failures_lock = threading.Lock()
+
+    pool = None
+    if parse_processes > 0:
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(max_workers=parse_processes)
+        # Threads stay the dispatchers so the queues still bound what is in flight
+        parse_workers = max(parse_workers, parse_processes)
+
+        def parse_call(item, payload):
+            return pool.submit(parse, item, payload).result()
+    else:
+        parse_call = parse
+
+    def start(stage, count, inbox, outbox, call):
+        threads = [
+            threading.Thread(
+                target=wcl_metrics.propagate(_worker),
+                args=(stage, stats[stage], inbox, outbox, call, failures, failures_lock),
+                name=f"wcl-pipeline-{stage}-{index}",
+                daemon=True
+            )
+            for index in range(count)
+        ]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def finish(threads, inbox):
+        # One stop marker per worker, queued behind the real work
+        for _ in threads:
+            inbox.put(_DONE)
+        for thread in threads:
+            thread.join()
+
+    started = time.perf_counter()
+    try:
+        fetchers = start('fetch', max(1, min(fetch_workers, sources.qsize())), sources, parse_queue, lambda item, _: fetch(item))
+        parsers = start('parse', parse_workers, parse_queue, upload_queue, parse_call)
+        uploaders = start('upload', upload_workers, upload_queue, results, upload)
+
+        finish(fetchers, sources)
+        finish(parsers, parse_queue)
+        finish(uploaders, upload_queue)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    wall = time.perf_counter() - started
+    completed = []
+    while not results.empty():
+        completed.append(results.get())
+
+    summary = {
+        'wall_ms': round(wall * 1000, 2),
+        'stages': {name: stage.snapshot() for name, stage in stats.items()},
+        # Busy time of all workers over wall time: 1.0 is one thing at a time, higher means overlap
+        'overlap': round(sum(stage.busy for stage in stats.values()) / wall, 2) if wall else None
+    }
+    metrics = wcl_metrics.current()
+    metrics.add('pipeline_wall_ms', wall * 1000)
+    for name, stage in stats.items():
+        metrics.add(f'pipeline_{name}_busy_ms', stage.busy * 1000)
+    return completed, failures, summary
@@ -0,0 +1,223 @@
+"""
+Client-side rate limiting for Warcraft Logs requests
+
+A token bucket caps the request rate, an AIMD controller adapts how many
+requests may be in flight (grow by one per window of successes, halve on
+429/503), and a shared pause honours Retry-After for every thread at once.
+wcl_http.get() drives all three; snapshot() reports their current state.
+"""
+
+import os
+import time
+import random
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# Requests per second across the process (0 disables the bucket) and how many may burst
+WCL_RATE_LIMIT = float(os.environ.get('WCL_RATE_LIMIT', '10'))
+WCL_RATE_BURST = int(os.environ.get('WCL_RATE_BURST', '20'))
+
+# Window observed_rate() reports over; older request start times are dropped
+RATE_WINDOW = 10.0
+
+# Adaptive in-flight limit; starts at the matrix fan-out and never exceeds the pool
+WCL_MIN_CONCURRENCY = int(os.environ.get('WCL_MIN_CONCURRENCY', '1'))
+WCL_INITIAL_CONCURRENCY = int(os.environ.get('WCL_INITIAL_CONCURRENCY', os.environ.get('WCL_MAX_CONCURRENCY', '8')))
+WCL_ADAPTIVE_MAX_CONCURRENCY = int(os.environ.get('WCL_ADAPTIVE_MAX_CONCURRENCY', os.environ.get('WCL_HTTP_POOL_SIZE', '16')))
+
+# Jittered exponential backoff: base * 2^attempt, capped, full jitter
+WCL_MAX_RETRIES = int(os.environ.get('WCL_MAX_RETRIES', '4'))
+WCL_RETRY_BASE = float(os.environ.get('WCL_RETRY_BASE', '0.5'))
+WCL_RETRY_MAX = float(os.environ.get('WCL_RETRY_MAX', '30'))
+
+THROTTLE_STATUSES = {429, 503}
+RETRY_STATUSES = THROTTLE_STATUSES | {502, 504}
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date), or None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+def backoff_delay(attempt, base=None, cap=None):
+    """Full-jitter exponential backoff for the given retry attempt (0-based)"""
+    base = WCL_RETRY_BASE if base is None else base
+    cap = WCL_RETRY_MAX if cap is None else cap
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() reserves a token and sleeps until it is due"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds):
+        """Stop handing out tokens for the next `seconds` (e.g. from Retry-After)"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def acquire(self):
+        """Take one token, blocking as long as needed; returns the seconds waited"""
+        if self.rate <= 0:
+            wait = self._paused_until - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+                return wait
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            # Tokens may go negative: each caller reserves its slot in the queue
+            self._tokens -= 1
+            wait = max(0.0, -self._tokens / self.rate, self._paused_until - now)
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+class AdaptiveConcurrency:
+    """AIMD limit on requests in flight: +1 per `limit` successes, halved when throttled"""
+
+    def __init__(self, initial, minimum=1, maximum=16, cooldown=1.0):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(self.maximum, max(self.minimum, initial)))
+        self.in_flight = 0
+        # One burst of 429s should only halve the limit once
+        self.cooldown = cooldown
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, throttled=False):
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+class RateLimiter:
+    """Token bucket, adaptive concurrency and retry counters shared by one process"""
+
+    def __init__(self, rate=None, burst=None, initial_concurrency=None, min_concurrency=None, max_concurrency=None):
+        self.bucket = TokenBucket(
+            WCL_RATE_LIMIT if rate is None else rate,
+            WCL_RATE_BURST if burst is None else burst
+        )
+        self.concurrency = AdaptiveConcurrency(
+            WCL_INITIAL_CONCURRENCY if initial_concurrency is None else initial_concurrency,
+            WCL_MIN_CONCURRENCY if min_concurrency is None else min_concurrency,
+            WCL_ADAPTIVE_MAX_CONCURRENCY if max_concurrency is None else max_concurrency
+        )
+        self._lock = threading.Lock()
+        # Start times within the last RATE_WINDOW seconds, oldest first
+        self._recent = deque()
+        self.counters = {'requests': 0, 'throttled': 0, 'retries': 0, 'errors': 0, 'wait_seconds': 0.0}
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.counters[key] += amount
+
+    def before_request(self):
+        """Block until both a token and a concurrency slot are available"""
+        waited = self.bucket.acquire()
+        self.concurrency.acquire()
+        with self._lock:
+            now = time.monotonic()
+            self._recent.append(now)
+            self._prune(now)
+            self.counters['requests'] += 1
+            self.counters['wait_seconds'] += waited
+
+    def after_response(self, status_code, retry_after=None):
+        """Feed a response back into the controller"""
+        throttled = status_code in THROTTLE_STATUSES
+        if throttled:
+            self._count('throttled')
+            if retry_after:
+                self.bucket.pause(retry_after)
+        self.concurrency.release(throttled=throttled)
+
+    def after_error(self):
+        """A request that never produced a response (connect/read failure)"""
+        self._count('errors')
+        self.concurrency.release(throttled=True)
+
+    def record_retry(self):
+        self._count('retries')
+
+    def _prune(self, now):
+        # Called under _lock on every request, so the deque never outgrows one window
+        cutoff = now - RATE_WINDOW
+        while self._recent and self._recent[0] < cutoff:
+            self._recent.popleft()
+
+    def observed_rate(self, window=RATE_WINDOW):
+        """Requests started per second over the last `window` seconds (at most RATE_WINDOW)"""
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            cutoff = now - window
+            return sum(1 for started in self._recent if started >= cutoff) / window
+
+    def snapshot(self):
+        """Current limits and counters, for logs and responses"""
+        observed = self.observed_rate()
+        with self._lock:
+            counters = dict(self.counters)
+        counters['wait_seconds'] = round(counters['wait_seconds'], 3)
+        return {
+            'rate_limit': self.bucket.rate,
+            'observed_rate': round(observed, 2),
+            'concurrency_limit': int(self.concurrency.limit),
+            'in_flight': self.concurrency.in_flight,
+            **counters
+        }
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+def get_rate_limiter():
+    """Return the process-wide limiter, creating it on first use"""
+    global _limiter
+
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter()
+    return _limiter
+
+def reset_rate_limiter(limiter=None):
+    """Replace the process-wide limiter (tests and load runs)"""
+    global _limiter
+    with _limiter_lock:
+        _limiter = limiter
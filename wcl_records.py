@@ -0,0 +1,232 @@
+"""
+Compact in-memory representation of scraped rows
+
+A RecordBatch holds one table's rows column by column: interned class/spec
+strings, packed float/int arrays for score/parses, and a single scrape
+timestamp plus shard filters for the whole batch. A RecordSet strings
+batches together. Both read like a list of row dicts (len, iteration,
+indexing, slicing) so downstream code keeps working, but the dicts only
+exist while they are being looked at.
+
+Parsers fill a RawRecordBatch with the cell text; wcl_normalize cleans and
+validates it into a RecordBatch.
+"""
+
+import sys
+from array import array
+from itertools import chain, islice
+
+RECORD_FIELDS = ('class', 'spec', 'score', 'parses')
+
+# Every class and its specs, as the summary table names them
+CLASS_SPECS = {
+    'Death Knight': ('Blood', 'Frost', 'Unholy'),
+    'Demon Hunter': ('Havoc', 'Vengeance'),
+    'Druid': ('Balance', 'Feral', 'Guardian', 'Restoration'),
+    'Evoker': ('Augmentation', 'Devastation', 'Preservation'),
+    'Hunter': ('Beast Mastery', 'Marksmanship', 'Survival'),
+    'Mage': ('Arcane', 'Fire', 'Frost'),
+    'Monk': ('Brewmaster', 'Mistweaver', 'Windwalker'),
+    'Paladin': ('Holy', 'Protection', 'Retribution'),
+    'Priest': ('Discipline', 'Holy', 'Shadow'),
+    'Rogue': ('Assassination', 'Outlaw', 'Subtlety'),
+    'Shaman': ('Elemental', 'Enhancement', 'Restoration'),
+    'Warlock': ('Affliction', 'Demonology', 'Destruction'),
+    'Warrior': ('Arms', 'Fury', 'Protection')
+}
+
+def intern_name(value):
+    """Share one string object per distinct class/spec name across all batches"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+class RawRecordBatch:
+    """Unvalidated cell text of one table, as the parsers extract it"""
+
+    __slots__ = ('scraped_at', 'tags', 'classes', 'specs', 'scores', 'parses', 'source')
+
+    def __init__(self, scraped_at=None, **tags):
+        self.scraped_at = scraped_at
+        self.tags = tags
+        self.classes = []
+        self.specs = []
+        self.scores = []
+        self.parses = []
+        # Extraction strategy that produced the rows (see wcl_parsers.extract_rows)
+        self.source = None
+
+    def append(self, class_name, spec_name, score_text, parses_text):
+        self.classes.append(intern_name(class_name))
+        self.specs.append(intern_name(spec_name))
+        self.scores.append(score_text)
+        self.parses.append(parses_text)
+
+    def tag(self, **tags):
+        self.tags.update(tags)
+
+    def rows(self):
+        """(class, spec, score text, parses text) tuples"""
+        return zip(self.classes, self.specs, self.scores, self.parses)
+
+    def __len__(self):
+        return len(self.classes)
+
+    def __eq__(self, other):
+        if isinstance(other, RawRecordBatch):
+            return list(self.rows()) == list(other.rows())
+        return NotImplemented
+
+    def __repr__(self):
+        return f"RawRecordBatch({len(self)} rows, scraped_at={self.scraped_at!r}, tags={self.tags!r})"
+
+class RecordBatch:
+    """Columnar rows sharing one scraped_at and one set of shard filters (tags)"""
+
+    __slots__ = ('scraped_at', 'tags', 'classes', 'specs', 'scores', 'parses', 'rejected', 'source')
+
+    def __init__(self, scraped_at=None, **tags):
+        self.scraped_at = scraped_at
+        self.tags = tags
+        self.classes = []
+        self.specs = []
+        self.scores = array('d')
+        self.parses = array('q')
+        # Rows that failed validation, kept for reporting rather than coerced
+        self.rejected = []
+        self.source = None
+
+    @classmethod
+    def from_columns(cls, classes, specs, scores, parses, scraped_at=None, **tags):
+        """Build a batch from already clean columns (scores/parses: any float/int iterable)"""
+        batch = cls(scraped_at, **tags)
+        batch.classes = [intern_name(name) for name in classes]
+        batch.specs = [intern_name(name) for name in specs]
+        batch.scores = array('d', scores)
+        batch.parses = array('q', parses)
+        return batch
+
+    @classmethod
+    def from_dicts(cls, rows, scraped_at=None, **tags):
+        """Build a batch from row dicts; per-row timestamps are replaced by the batch's"""
+        batch = cls(scraped_at, **tags)
+        for row in rows:
+            batch.append(row['class'], row['spec'], row['score'], row['parses'])
+        return batch
+
+    def append(self, class_name, spec_name, score, parses):
+        self.classes.append(intern_name(class_name))
+        self.specs.append(intern_name(spec_name))
+        self.scores.append(score)
+        self.parses.append(parses)
+
+    def tag(self, **tags):
+        """Attach shard filters (zone, boss, ...) to every row of the batch"""
+        self.tags.update(tags)
+
+    def row(self, index):
+        return {
+            'class': self.classes[index],
+            'spec': self.specs[index],
+            'score': self.scores[index],
+            'parses': self.parses[index],
+            'scraped_at': self.scraped_at,
+            **self.tags
+        }
+
+    def __len__(self):
+        return len(self.classes)
+
+    def __iter__(self):
+        for index in range(len(self.classes)):
+            yield self.row(index)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.row(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('record index out of range')
+        return self.row(index)
+
+    def __eq__(self, other):
+        if isinstance(other, (RecordBatch, RecordSet, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self):
+        return f"RecordBatch({len(self)} rows, scraped_at={self.scraped_at!r}, tags={self.tags!r})"
+
+    def to_dicts(self):
+        return list(self)
+
+    def columns(self):
+        """Column name -> list of values, with batch-level fields repeated per row"""
+        count = len(self)
+        columns = {
+            'class': self.classes,
+            'spec': self.specs,
+            'score': self.scores.tolist(),
+            'parses': self.parses.tolist(),
+            'scraped_at': [self.scraped_at] * count
+        }
+        for key, value in self.tags.items():
+            columns[key] = [value] * count
+        return columns
+
+class RecordSet:
+    """Ordered collection of batches that reads like one list of rows"""
+
+    __slots__ = ('batches',)
+
+    def __init__(self, batches=()):
+        self.batches = list(batches)
+
+    def add(self, batch):
+        self.batches.append(batch)
+
+    def __len__(self):
+        return sum(len(batch) for batch in self.batches)
+
+    def __iter__(self):
+        return chain.from_iterable(self.batches)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if index.step is None and (index.start or 0) >= 0 and (index.stop is None or index.stop >= 0):
+                return list(islice(self, index.start, index.stop))
+            return list(self)[index]
+        if index < 0:
+            index += len(self)
+        for batch in self.batches:
+            if 0 <= index < len(batch):
+                return batch.row(index)
+            index -= len(batch)
+        raise IndexError('record index out of range')
+
+    def __eq__(self, other):
+        if isinstance(other, (RecordBatch, RecordSet, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self):
+        return f"RecordSet({len(self.batches)} batches, {len(self)} rows)"
+
+    @property
+    def rejected(self):
+        return [row for batch in self.batches for row in getattr(batch, 'rejected', ())]
+
+    def to_dicts(self):
+        return list(self)
+
+    def columns(self):
+        """Concatenated columns of every batch; filters missing from a batch are None"""
+        names = list(RECORD_FIELDS) + ['scraped_at']
+        for batch in self.batches:
+            names += [key for key in batch.tags if key not in names]
+
+        columns = {name: [] for name in names}
+        for batch in self.batches:
+            batch_columns = batch.columns()
+            for name in names:
+                columns[name].extend(batch_columns.get(name, [None] * len(batch)))
+        return columns
@@ -0,0 +1,200 @@
+"""
+Coalescing of concurrent identical work
+
+SingleFlight.do(key, fn) runs fn once for every caller that arrives while
+it is in flight; they all get its result (or its exception). With a
+BlobLease, callers on other instances coalesce too: the instance running fn
+holds a lease blob for the key and leaves the result next to it, and
+instances that find the lease taken wait for that result instead of
+running fn themselves. Results must be JSON-serializable for that.
+
+BlobLease.hold(key) is the plain mutual exclusion underneath, for work every
+caller must do itself, one at a time (read-modify-write of a shared file).
+"""
+
+import os
+import json
+import time
+import socket
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+
+WCL_SINGLEFLIGHT_LEASE = os.environ.get('WCL_SINGLEFLIGHT_LEASE', 'false') == 'true'
+
+# A lease older than this is assumed abandoned (crashed instance) and taken over
+WCL_LEASE_SECONDS = float(os.environ.get('WCL_LEASE_SECONDS', '300'))
+WCL_LEASE_POLL_SECONDS = float(os.environ.get('WCL_LEASE_POLL_SECONDS', '1'))
+# How long to wait on another instance before doing the work anyway
+WCL_LEASE_WAIT_SECONDS = float(os.environ.get('WCL_LEASE_WAIT_SECONDS', '120'))
+# Results finishing this long before a caller arrived still count, to absorb clock skew
+WCL_LEASE_CLOCK_SKEW = 5.0
+
+LEASE_OWNER = os.environ.get('WEBSITE_INSTANCE_ID') or f"{socket.gethostname()}:{os.getpid()}"
+
+class _Flight:
+    __slots__ = ('done', 'result', 'shared', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.shared = False
+        self.error = None
+
+class SingleFlight:
+    """Per-key deduplication of concurrent calls within the process, optionally across instances"""
+
+    def __init__(self, lease=None):
+        self.lease = lease
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Run fn() unless a call for key is already in flight; returns (result, shared)"""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            if self.lease is not None:
+                flight.result, flight.shared = self.lease.run(key, fn)
+            else:
+                flight.result = fn()
+            return flight.result, flight.shared
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._flights)
+
+class BlobLease:
+    """Cross-instance coalescing through create-if-absent lease blobs in the lake"""
+
+    def __init__(self, get_file_system_client, prefix='_leases', ttl=WCL_LEASE_SECONDS,
+                 poll=WCL_LEASE_POLL_SECONDS, wait=WCL_LEASE_WAIT_SECONDS):
+        self.get_file_system_client = get_file_system_client
+        self.prefix = prefix
+        self.ttl = ttl
+        self.poll = poll
+        self.wait = wait
+
+    def _clients(self, key):
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+        file_system_client = self.get_file_system_client()
+        return (
+            file_system_client.get_file_client(f"{self.prefix}/{digest}.lease"),
+            file_system_client.get_file_client(f"{self.prefix}/{digest}.result.json")
+        )
+
+    def _acquire(self, lease_client):
+        """Create the lease blob; False if another live instance holds it"""
+        lease = json.dumps({'owner': LEASE_OWNER, 'expires_at': time.time() + self.ttl})
+        while True:
+            try:
+                # Create with If-None-Match: *, so exactly one instance gets the lease.
+                # (overwrite=False only flushes onto an existing path; it never creates one)
+                lease_client.upload_data(lease, overwrite=True, match_condition=MatchConditions.IfMissing)
+                return True
+            except (ResourceExistsError, ResourceModifiedError):
+                pass
+
+            try:
+                downloader = lease_client.download_file()
+                held = json.loads(downloader.readall())
+            except ResourceNotFoundError:
+                # Released between the two calls; try again
+                continue
+            except ValueError:
+                # Create and flush are separate calls, so the holder may not have written it yet;
+                # an unreadable lease only counts as abandoned once it is older than any lease
+                held = {'owner': None, 'expires_at': downloader.properties.last_modified.timestamp() + self.ttl}
+
+            if held.get('expires_at', 0) > time.time():
+                return False
+            logging.warning(f"Taking over expired lease held by {held.get('owner')}")
+            try:
+                lease_client.delete_file()
+            except ResourceNotFoundError:
+                pass
+
+    def _release(self, lease_client):
+        try:
+            lease_client.delete_file()
+        except ResourceNotFoundError:
+            pass
+
+    @contextmanager
+    def hold(self, key):
+        """Hold the key's lease for the duration of the block; raises TimeoutError after waiting `wait` seconds"""
+        lease_client, _ = self._clients(key)
+        arrived = time.time()
+        while not self._acquire(lease_client):
+            if time.time() - arrived > self.wait:
+                raise TimeoutError(f"Lease for {key} still held after {self.wait:.0f}s")
+            time.sleep(self.poll)
+        try:
+            yield
+        finally:
+            self._release(lease_client)
+
+    def _read_result(self, result_client, since):
+        try:
+            result = json.loads(result_client.download_file().readall())
+        except (ResourceNotFoundError, ValueError):
+            return None
+        return result if result.get('finished_at', 0) >= since - WCL_LEASE_CLOCK_SKEW else None
+
+    def run(self, key, fn):
+        """Run fn() under the key's lease, or return the result of the instance holding it; returns (result, shared)"""
+        lease_client, result_client = self._clients(key)
+        arrived = time.time()
+        held = False
+
+        while True:
+            try:
+                held = self._acquire(lease_client)
+            except Exception as e:
+                # Coalescing is an optimization; never fail the work because storage is unavailable
+                logging.warning(f"Lease for {key} unavailable, running without it: {str(e)}")
+                break
+            if held:
+                break
+            time.sleep(self.poll)
+            result = self._read_result(result_client, arrived)
+            if result is not None:
+                return result['value'], True
+            if time.time() - arrived > self.wait:
+                logging.warning(f"Gave up waiting {self.wait:.0f}s on the lease for {key}, running it here")
+                break
+
+        try:
+            value = fn()
+            try:
+                result_client.upload_data(
+                    json.dumps({'owner': LEASE_OWNER, 'finished_at': time.time(), 'value': value}, default=str),
+                    overwrite=True
+                )
+            except Exception as e:
+                # Waiting instances will take the lease and run it themselves
+                logging.warning(f"Could not publish the result for {key}: {str(e)}")
+            return value, False
+        finally:
+            if held:
+                self._release(lease_client)